@@ -0,0 +1,29 @@
+import click
+import frappe
+from frappe.commands import get_site, pass_context
+
+
+@click.command("recompute-progress")
+@click.option("--course", "courses", multiple=True, help="Course to recompute, all by default")
+@click.option("--workers", default=1, type=int, help="Number of processes to split courses across")
+@click.option("--chunk-size", default=1000, type=int, help="Enrollments written per update")
+@click.option("--checkpoint", help="File to record finished courses in, to resume from")
+@pass_context
+def recompute_progress(context, courses, workers, chunk_size, checkpoint):
+	"""Recompute the lesson counts and the progress of enrollments."""
+	from lms.lms.utils import recompute_progress
+
+	frappe.init(site=get_site(context))
+	frappe.connect()
+	try:
+		recompute_progress(
+			courses=list(courses) or None,
+			chunk_size=chunk_size,
+			workers=workers,
+			checkpoint=checkpoint,
+		)
+	finally:
+		frappe.destroy()
+
+
+commands = [recompute_progress]
@@ -103,17 +103,80 @@ doc_events = {
 		]
 	},
 	"Discussion Reply": {"after_insert": "lms.lms.utils.handle_notifications"},
+	"LMS Course": {
+		"on_update": [
+			"lms.lms.utils.clear_catalog_cache",
+			"lms.lms.utils.on_course_structure_change",
+		],
+		"on_trash": "lms.lms.utils.clear_catalog_cache",
+	},
+	# The hooks on child doctypes (Chapter Reference, Lesson Reference, Course
+	# Instructor, Batch Course, Batch Student, Has Role) only fire when a row is
+	# inserted, saved or deleted on its own, as the api does. Rows saved with
+	# their parent are covered by the hooks of the parent doctype.
+	"Chapter Reference": {
+		"on_update": "lms.lms.utils.on_course_structure_change",
+		"on_trash": "lms.lms.utils.on_course_structure_change",
+	},
+	"Lesson Reference": {
+		"on_update": "lms.lms.utils.on_course_structure_change",
+		"on_trash": "lms.lms.utils.on_course_structure_change",
+	},
+	"Course Chapter": {
+		"on_update": "lms.lms.utils.on_course_structure_change",
+		"on_trash": "lms.lms.utils.on_course_structure_change",
+	},
+	"Course Lesson": {
+		"on_update": "lms.lms.utils.on_course_structure_change",
+		"on_trash": "lms.lms.utils.on_course_structure_change",
+	},
+	"Course Instructor": {
+		"on_update": "lms.lms.utils.clear_catalog_cache",
+		"on_trash": "lms.lms.utils.clear_catalog_cache",
+	},
+	"LMS Batch": {
+		"on_update": "lms.lms.utils.clear_catalog_cache",
+		"on_trash": "lms.lms.utils.clear_catalog_cache",
+	},
+	"Batch Course": {
+		"on_update": "lms.lms.utils.clear_catalog_cache",
+		"on_trash": "lms.lms.utils.clear_catalog_cache",
+	},
+	"Batch Student": {
+		"on_update": "lms.lms.utils.clear_catalog_cache",
+		"on_trash": "lms.lms.utils.clear_catalog_cache",
+	},
+	"LMS Enrollment": {
+		"after_insert": "lms.lms.api.mark_course_statistics_dirty",
+		"on_trash": "lms.lms.api.mark_course_statistics_dirty",
+	},
+	"LMS Course Review": {
+		"on_update": "lms.lms.utils.on_course_review_change",
+		"after_delete": "lms.lms.utils.on_course_review_change",
+	},
+	"Has Role": {
+		"on_update": "lms.lms.utils.clear_role_directory",
+		"on_trash": "lms.lms.utils.clear_role_directory",
+	},
 	"Notification Log": {"on_change": "lms.lms.utils.publish_notifications"},
 }
 
 # Scheduled Tasks
 # ---------------
 scheduler_events = {
+	"cron": {
+		"* * * * *": ["lms.lms.utils.flush_current_lessons"],
+		"*/10 * * * *": ["lms.lms.utils.reconcile_platform_counters"],
+	},
 	"hourly": [
 		"lms.lms.doctype.lms_certificate_request.lms_certificate_request.schedule_evals",
+		"lms.lms.api.update_dirty_course_statistics",
+		"lms.lms.doctype.lms_chart_rollup.lms_chart_rollup.update_chart_rollups",
+	],
+	"daily": [
+		"lms.job.doctype.job_opportunity.job_opportunity.update_job_openings",
 		"lms.lms.api.update_course_statistics",
 	],
-	"daily": ["lms.job.doctype.job_opportunity.job_opportunity.update_job_openings"],
 }
 
 fixtures = ["Custom Field", "Function", "Industry", "LMS Category"]
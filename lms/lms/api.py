@@ -11,9 +11,18 @@ from frappe.translate import get_all_translations
 from frappe import _
 from frappe.query_builder import DocType
 from frappe.query_builder.functions import Count
-from frappe.utils import time_diff, now_datetime, get_datetime, flt
+from frappe.utils import time_diff, now_datetime, get_datetime, cint, flt
 from typing import Optional
-from lms.lms.utils import get_average_rating, get_lesson_count
+from lms.lms.utils import (
+	get_course_lesson_counts,
+	get_platform_counters,
+	get_lms_roles,
+	clear_catalog_cache,
+	clear_course_structure_cache,
+	buffer_current_lesson,
+	recompute_course_progress,
+	update_course_lesson_count,
+)
 from xml.dom.minidom import parseString
 
 
@@ -43,15 +52,15 @@ def submit_solution(exercise, code):
 
 @frappe.whitelist()
 def save_current_lesson(course_name, lesson_name):
-	"""Saves the current lesson for a student/mentor."""
-	name = frappe.get_value(
-		doctype="LMS Enrollment",
-		filters={"course": course_name, "member": frappe.session.user},
-		fieldname="name",
-	)
-	if not name:
+	"""Saves the current lesson for a student/mentor.
+
+	The lesson is buffered and written to the enrollment by a scheduled job.
+	"""
+	if not frappe.db.exists(
+		"LMS Enrollment", {"course": course_name, "member": frappe.session.user}
+	):
 		return
-	frappe.db.set_value("LMS Enrollment", name, "current_lesson", lesson_name)
+	buffer_current_lesson(course_name, lesson_name)
 
 
 @frappe.whitelist()
@@ -265,23 +274,7 @@ def get_job_opportunities():
 
 @frappe.whitelist(allow_guest=True)
 def get_chart_details():
-	details = frappe._dict()
-	details.enrollments = frappe.db.count("LMS Enrollment")
-	details.courses = frappe.db.count(
-		"LMS Course",
-		{
-			"published": 1,
-			"upcoming": 0,
-		},
-	)
-	details.users = frappe.db.count(
-		"User", {"enabled": 1, "name": ["not in", ("Administrator", "Guest")]}
-	)
-	details.completions = frappe.db.count(
-		"LMS Enrollment", {"progress": ["like", "%100%"]}
-	)
-	details.lesson_completions = frappe.db.count("LMS Course Progress")
-	return details
+	return get_platform_counters()
 
 
 @frappe.whitelist()
@@ -504,6 +497,7 @@ def delete_lesson(lesson, chapter):
 
 	# Delete progress
 	frappe.db.delete("LMS Course Progress", {"lesson": lesson})
+	recompute_course_progress([chapter.course])
 
 	# Delete Lesson
 	frappe.db.delete("Course Lesson", lesson)
@@ -517,6 +511,10 @@ def update_lesson_index(lesson, sourceChapter, targetChapter, idx):
 	if not hasMoved:
 		update_target_chapter(lesson, targetChapter, idx)
 
+	clear_course_structure_cache(
+		frappe.db.get_value("Course Chapter", sourceChapter, "course")
+	)
+
 
 def update_source_chapter(lesson, chapter, idx, hasMoved=False):
 	lessons = frappe.get_all(
@@ -610,8 +608,9 @@ def get_members(start=0, search=""):
 		start=start,
 	)
 
+	member_roles = get_lms_roles([member.name for member in members])
 	for member in members:
-		roles = frappe.get_roles(member.name)
+		roles = member_roles[member.name]
 		if "Moderator" in roles:
 			member.role = "Moderator"
 		elif "Course Creator" in roles:
@@ -778,24 +777,75 @@ def get_payment_gateway_details(payment_gateway):
 	}
 
 
-def update_course_statistics():
-	courses = frappe.get_all("LMS Course", fields=["name"])
+COURSE_STATISTICS_DIRTY_KEY = "lms_course_statistics_dirty"
 
-	for course in courses:
-		lessons = get_lesson_count(course.name)
 
-		enrollments = frappe.db.count(
-			"LMS Enrollment", {"course": course.name, "member_type": "Student"}
-		)
+def update_course_statistics(courses=None):
+	"""Updates the lesson count, enrollments and average rating of the courses.
+
+	Lessons and enrollments are counted for all courses with one grouped query
+	each, the rating is derived from the aggregates kept on the course. Only
+	the courses whose values changed are written.
+	"""
+	if courses is not None and not courses:
+		return
 
-		avg_rating = get_average_rating(course.name) or 0
-		avg_rating = flt(avg_rating, frappe.get_system_settings("float_precision") or 3)
+	filters = {"name": ["in", courses]} if courses is not None else {}
+	course_filters = {"course": ["in", courses]} if courses is not None else {}
+	current = frappe.get_all(
+		"LMS Course",
+		filters,
+		["name", "lessons", "enrollments", "rating", "rating_sum", "rating_count"],
+	)
 
-		frappe.db.set_value(
-			"LMS Course",
-			course.name,
-			{"lessons": lessons, "enrollments": enrollments, "rating": avg_rating},
-		)
+	lessons = get_course_lesson_counts([course.name for course in current])
+	enrollments = frappe.get_all(
+		"LMS Enrollment",
+		{"member_type": "Student", **course_filters},
+		["course", "count(name) as count"],
+		group_by="course",
+	)
+	enrollments = {row.course: row.count for row in enrollments}
+
+	precision = frappe.get_system_settings("float_precision") or 3
+	changed = False
+	for course in current:
+		values = {
+			"lessons": cint(lessons.get(course.name)),
+			"enrollments": cint(enrollments.get(course.name)),
+			"rating": flt(
+				course.rating_sum / course.rating_count if course.rating_count else 0, precision
+			),
+		}
+		if (
+			cint(course.lessons) != values["lessons"]
+			or cint(course.enrollments) != values["enrollments"]
+			or flt(course.rating, precision) != values["rating"]
+		):
+			frappe.db.set_value("LMS Course", course.name, values)
+			changed = True
+
+	if changed:
+		clear_catalog_cache()
+
+
+def update_dirty_course_statistics():
+	"""Updates the statistics of the courses marked dirty since the last run."""
+	courses = [
+		frappe.safe_decode(course)
+		for course in frappe.cache().smembers(COURSE_STATISTICS_DIRTY_KEY)
+	]
+	if not courses:
+		return
+
+	update_course_statistics(courses)
+	frappe.cache().srem(COURSE_STATISTICS_DIRTY_KEY, *courses)
+
+
+def mark_course_statistics_dirty(doc, method=None):
+	"""Marks the course of an enrollment for the next statistics update."""
+	if doc.course:
+		frappe.cache().sadd(COURSE_STATISTICS_DIRTY_KEY, doc.course)
 
 
 @frappe.whitelist()
@@ -986,7 +1036,10 @@ def add_lesson(title, chapter, course):
 @frappe.whitelist()
 def delete_chapter(chapter):
 	chapterInfo = frappe.db.get_value(
-		"Course Chapter", chapter, ["is_scorm_package", "scorm_package_path"], as_dict=True
+		"Course Chapter",
+		chapter,
+		["is_scorm_package", "scorm_package_path", "course"],
+		as_dict=True,
 	)
 
 	if chapterInfo.is_scorm_package:
@@ -996,6 +1049,8 @@ def delete_chapter(chapter):
 	frappe.db.delete("Lesson Reference", {"parent": chapter})
 	frappe.db.delete("Course Lesson", {"chapter": chapter})
 	frappe.db.delete("Course Chapter", chapter)
+	clear_course_structure_cache(chapterInfo.course)
+	update_course_lesson_count(chapterInfo.course)
 
 
 def delete_scorm_package(scorm_package_path):
@@ -5,38 +5,69 @@ import frappe
 from frappe import _
 from frappe.model.document import Document
 from frappe.utils.telemetry import capture
-from lms.lms.utils import get_course_progress
-from ...md import find_macros
+from lms.lms.utils import (
+	buffer_current_lesson,
+	get_lesson_metadata,
+	increment_completed_lessons,
+)
 import json
 
+PROGRESS_UPDATE_TIMEOUT = 600
+
 
 class CourseLesson(Document):
 	def validate(self):
 		# self.check_and_create_folder()
 		self.validate_quiz_id()
+		self.set_metadata()
 
 	def validate_quiz_id(self):
 		if self.quiz_id and not frappe.db.exists("LMS Quiz", self.quiz_id):
 			frappe.throw(_("Invalid Quiz ID"))
 
+	def set_metadata(self):
+		"""Stores the icon, media kinds and referenced documents of the lesson,
+		so that read paths do not have to parse the lesson body."""
+		metadata = get_lesson_metadata(self.body, self.content)
+		self.icon = metadata.pop("icon")
+		self.metadata = json.dumps(metadata)
+
+	def get_metadata(self):
+		if self.metadata:
+			return frappe._dict(json.loads(self.metadata))
+		return get_lesson_metadata(self.body, self.content)
+
 	def on_update(self):
 		dynamic_documents = ["Exercise", "Quiz"]
 		for section in dynamic_documents:
 			self.update_lesson_name_in_document(section)
 
 	def update_lesson_name_in_document(self, section):
+		"""Links the quizzes and exercises of the lesson back to it.
+
+		The links are written directly, so saving the lesson neither validates nor
+		modifies the linked documents. References to missing documents are skipped.
+		"""
 		doctype_map = {"Exercise": "LMS Exercise", "Quiz": "LMS Quiz"}
-		macros = find_macros(self.body)
-		documents = [value for name, value in macros if name == section]
+		metadata_map = {"Exercise": "exercises", "Quiz": "quizzes"}
+		doctype = doctype_map[section]
+		documents = self.get_metadata().get(metadata_map[section]) or []
+		existing_documents = (
+			set(frappe.get_all(doctype, {"name": ["in", documents]}, pluck="name"))
+			if documents
+			else set()
+		)
+		has_index = frappe.get_meta(doctype).has_field("index_")
 		index = 1
 		for name in documents:
-			e = frappe.get_doc(doctype_map[section], name)
-			e.lesson = self.name
-			e.index_ = index
-			e.course = self.course
-			e.save(ignore_permissions=True)
+			if name not in existing_documents:
+				continue
+			values = {"lesson": self.name, "course": self.course}
+			if has_index:
+				values["index_"] = index
+			frappe.db.set_value(doctype, name, values, update_modified=False)
 			index += 1
-		self.update_orphan_documents(doctype_map[section], documents)
+		self.update_orphan_documents(doctype, documents)
 
 	def update_orphan_documents(self, doctype, documents):
 		"""Updates the documents that were previously part of this lesson,
@@ -47,12 +78,11 @@ class CourseLesson(Document):
 		}
 		active_documents = set(documents)
 		orphan_documents = linked_documents - active_documents
+		values = {"lesson": None, "course": None}
+		if frappe.get_meta(doctype).has_field("index_"):
+			values["index_"] = 0
 		for name in orphan_documents:
-			ex = frappe.get_doc(doctype, name)
-			ex.lesson = None
-			ex.course = None
-			ex.index_ = 0
-			ex.save(ignore_permissions=True)
+			frappe.db.set_value(doctype, name, values, update_modified=False)
 
 	def check_and_create_folder(self):
 		args = {
@@ -65,11 +95,7 @@ class CourseLesson(Document):
 			folder.save(ignore_permissions=True)
 
 	def get_exercises(self):
-		if not self.body:
-			return []
-
-		macros = find_macros(self.body)
-		exercises = [value for name, value in macros if name == "Exercise"]
+		exercises = self.get_metadata().get("exercises") or []
 		return [frappe.get_doc("LMS Exercise", name) for name in exercises]
 
 	def get_progress(self):
@@ -91,7 +117,7 @@ def save_progress(lesson, course):
 	if not membership:
 		return
 
-	frappe.db.set_value("LMS Enrollment", membership, "current_lesson", lesson)
+	buffer_current_lesson(course, lesson)
 
 	if frappe.db.exists(
 		"LMS Course Progress", {"lesson": lesson, "member": frappe.session.user}
@@ -102,23 +128,158 @@ def save_progress(lesson, course):
 	if not quiz_completed:
 		return 0
 
-	frappe.get_doc(
+	if not insert_progress(lesson, course):
+		return
+
+	progress = increment_completed_lessons(membership, course)
+	enqueue_progress_update(lesson, course, progress)
+	return progress
+
+
+def enqueue_progress_update(lesson, course, progress, member=None):
+	"""Queues the side effects of a lesson completion once the request commits.
+
+	Completions are pushed to a redis list per member and course, and a single
+	job per member and course processes all of them.
+	"""
+	if not member:
+		member = frappe.session.user
+
+	def push_progress_update():
+		frappe.cache().rpush(
+			get_progress_update_key(member, course),
+			json.dumps({"lesson": lesson, "progress": progress}),
+		)
+		if claim_progress_updates(member, course):
+			frappe.enqueue(
+				"lms.lms.doctype.course_lesson.course_lesson.process_progress_updates",
+				queue="short",
+				timeout=PROGRESS_UPDATE_TIMEOUT,
+				member=member,
+				course=course,
+			)
+
+	frappe.db.after_commit.add(push_progress_update)
+
+
+def process_progress_updates(member, course):
+	"""Evaluates the badges and captures the analytics of the queued completions,
+	then runs the enrollment triggers once for the program progress and badges.
+
+	The job holds the processing flag of the member and course while it runs.
+	It releases the flag before checking the list one last time, so a completion
+	pushed after that check enqueues a new job.
+	"""
+	key = get_progress_update_key(member, course)
+	cache = frappe.cache()
+
+	while True:
+		try:
+			process_queued_progress_updates(member, course)
+		finally:
+			release_progress_updates(member, course)
+
+		if not cache.llen(key) or not claim_progress_updates(member, course):
+			break
+
+
+def process_queued_progress_updates(member, course):
+	key = get_progress_update_key(member, course)
+	cache = frappe.cache()
+
+	while cache.llen(key):
+		updates = cache.lrange(key, 0, -1)
+		while updates:
+			for update in updates:
+				update = json.loads(update)
+				capture_progress_for_analytics(update["progress"], course)
+				name = frappe.db.get_value(
+					"LMS Course Progress", {"member": member, "lesson": update["lesson"]}
+				)
+				if name:
+					frappe.get_doc("LMS Course Progress", name).run_method("on_change")
+
+			# completions queued while this job runs are processed in the next iteration
+			cache.ltrim(key, len(updates), -1)
+			updates = cache.lrange(key, 0, -1)
+
+		membership = frappe.db.get_value(
+			"LMS Enrollment", {"member": member, "course": course}
+		)
+		if membership:
+			enrollment = frappe.get_doc("LMS Enrollment", membership)
+			enrollment.run_method("on_update")
+			enrollment.run_method("on_change")
+
+
+def claim_progress_updates(member, course):
+	"""Sets the processing flag of the member and course.
+
+	Returns False if another job already holds it. The flag expires with the
+	job timeout, so a killed job does not block the completions for good.
+	"""
+	cache = frappe.cache()
+	return bool(
+		cache.set(
+			cache.make_key(get_progress_update_flag_key(member, course)),
+			1,
+			nx=True,
+			ex=PROGRESS_UPDATE_TIMEOUT,
+		)
+	)
+
+
+def release_progress_updates(member, course):
+	frappe.cache().delete_value(get_progress_update_flag_key(member, course))
+
+
+def get_progress_update_flag_key(member, course):
+	return f"{get_progress_update_key(member, course)}:processing"
+
+
+def get_progress_update_key(member, course):
+	return f"lms_progress_updates:{member}:{course}"
+
+
+def insert_progress(lesson, course, member=None):
+	"""Marks the lesson complete for the member.
+
+	The unique (member, course, lesson) key makes concurrent or repeated
+	completions of the same lesson insert a single row, the others are rolled
+	back to a savepoint. Returns the progress document if it was inserted.
+	"""
+	if not member:
+		member = frappe.session.user
+
+	now = frappe.utils.now()
+	progress = frappe.get_doc(
 		{
 			"doctype": "LMS Course Progress",
+			"name": frappe.generate_hash(length=10),
+			"owner": frappe.session.user,
+			"modified_by": frappe.session.user,
+			"creation": now,
+			"modified": now,
+			"docstatus": 0,
 			"lesson": lesson,
+			"chapter": frappe.db.get_value("Course Lesson", lesson, "chapter"),
+			"course": course,
 			"status": "Complete",
-			"member": frappe.session.user,
+			"member": member,
+			"member_name": frappe.db.get_value("User", member, "full_name"),
 		}
-	).save(ignore_permissions=True)
-
-	progress = get_course_progress(course)
-	capture_progress_for_analytics(progress, course)
+	)
 
-	# Had to get doc, as on_change doesn't trigger when you use set_value. The trigger is necesary for badge to get assigned.
-	enrollment = frappe.get_doc("LMS Enrollment", membership)
-	enrollment.progress = progress
-	enrollment.save()
-	enrollment.run_method("on_change")
+	values = progress.get_valid_dict(convert_dates_to_str=True)
+	Progress = frappe.qb.DocType("LMS Course Progress")
+	frappe.db.savepoint("insert_progress")
+	try:
+		frappe.qb.into(Progress).columns(*values.keys()).insert(*values.values()).run()
+	except Exception as e:
+		if not frappe.db.is_unique_key_violation(e):
+			raise
+		frappe.db.rollback(save_point="insert_progress")
+		return
 
 	return progress
 
@@ -128,22 +289,19 @@ def capture_progress_for_analytics(progress, course):
 		capture("course_progress", "lms", properties={"course": course, "progress": progress})
 
 
-def get_quiz_progress(lesson):
+def get_lesson_quizzes(lesson):
+	"""Returns the quizzes referred to in the lesson."""
 	lesson_details = frappe.db.get_value(
-		"Course Lesson", lesson, ["body", "content"], as_dict=1
+		"Course Lesson", lesson, ["metadata", "body", "content"], as_dict=1
 	)
-	quizzes = []
+	if lesson_details.metadata:
+		return json.loads(lesson_details.metadata).get("quizzes") or []
 
-	if lesson_details.content:
-		content = json.loads(lesson_details.content)
+	return get_lesson_metadata(lesson_details.body, lesson_details.content).quizzes
 
-		for block in content.get("blocks"):
-			if block.get("type") == "quiz":
-				quizzes.append(block.get("data").get("quiz"))
 
-	elif lesson_details.body:
-		macros = find_macros(lesson_details.body)
-		quizzes = [value for name, value in macros if name == "Quiz"]
+def get_quiz_progress(lesson):
+	quizzes = get_lesson_quizzes(lesson)
 
 	for quiz in quizzes:
 		passing_percentage = frappe.db.get_value("LMS Quiz", quiz, "passing_percentage")
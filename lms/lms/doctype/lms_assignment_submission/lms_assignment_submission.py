@@ -6,6 +6,7 @@ from frappe import _
 from frappe.model.document import Document
 from frappe.utils import validate_url, validate_email_address
 from frappe.email.doctype.email_template.email_template import get_email_template
+from lms.lms.utils import get_role_users
 
 
 class LMSAssignmentSubmission(Document):
@@ -51,10 +52,11 @@ class LMSAssignmentSubmission(Document):
 			"submission_name": self.name,
 		}
 
-		moderators = frappe.get_all("Has Role", {"role": "Moderator"}, pluck="parent")
-		for moderator in moderators:
-			if not validate_email_address(moderator):
-				moderators.remove(moderator)
+		moderators = [
+			moderator
+			for moderator in get_role_users("Moderator")
+			if validate_email_address(moderator)
+		]
 
 		if custom_template:
 			email_template = get_email_template(custom_template, args)
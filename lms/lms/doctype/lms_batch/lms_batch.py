@@ -10,8 +10,9 @@ from datetime import timedelta
 from frappe.model.document import Document
 from frappe.utils import cint, format_date, format_datetime, get_time, getdate, add_days
 from lms.lms.utils import (
+	get_completed_lessons,
 	get_lessons,
-	get_lesson_index,
+	get_lesson_indexes,
 	get_lesson_url,
 	get_quiz_details,
 	get_assignment_details,
@@ -413,28 +414,39 @@ def get_live_classes(batch):
 
 
 def get_timetable_details(timetable):
+	lesson_names = [
+		entry.reference_docname
+		for entry in timetable
+		if entry.reference_doctype == "Course Lesson"
+	]
+	lessons = {}
+	if lesson_names:
+		lessons = {
+			lesson.name: lesson
+			for lesson in frappe.get_all(
+				"Course Lesson", {"name": ["in", lesson_names]}, ["name", "title", "course"]
+			)
+		}
+	lesson_indexes = get_lesson_indexes(lesson_names)
+	completed_lessons = get_completed_lessons(lessons=lesson_names)
+
 	for entry in timetable:
-		entry.title = frappe.db.get_value(
-			entry.reference_doctype, entry.reference_docname, "title"
-		)
 		assessment = frappe._dict({"assessment_name": entry.reference_docname})
 
 		if entry.reference_doctype == "Course Lesson":
-			course = frappe.db.get_value(
-				entry.reference_doctype, entry.reference_docname, "course"
+			lesson = lessons.get(entry.reference_docname) or frappe._dict()
+			entry.title = lesson.title
+			entry.url = get_lesson_url(
+				lesson.course, lesson_indexes.get(entry.reference_docname, "1-1")
 			)
-			entry.url = get_lesson_url(course, get_lesson_index(entry.reference_docname))
+			entry.completed = entry.reference_docname in completed_lessons
+			continue
 
-			entry.completed = (
-				True
-				if frappe.db.exists(
-					"LMS Course Progress",
-					{"lesson": entry.reference_docname, "member": frappe.session.user},
-				)
-				else False
-			)
+		entry.title = frappe.db.get_value(
+			entry.reference_doctype, entry.reference_docname, "title"
+		)
 
-		elif entry.reference_doctype == "LMS Quiz":
+		if entry.reference_doctype == "LMS Quiz":
 			entry.url = "/quizzes"
 			details = get_quiz_details(assessment, frappe.session.user)
 			entry.update(details)
@@ -455,13 +467,16 @@ def is_milestone_complete(idx, batch):
 		fields=["reference_doctype", "reference_docname", "idx"],
 		order_by="idx",
 	)
+	lessons = [
+		row.reference_docname
+		for row in previous_rows
+		if row.reference_doctype == "Course Lesson"
+	]
+	completed_lessons = get_completed_lessons(lessons=lessons)
 
 	for row in previous_rows:
 		if row.reference_doctype == "Course Lesson":
-			if not frappe.db.exists(
-				"LMS Course Progress",
-				{"member": frappe.session.user, "lesson": row.reference_docname},
-			):
+			if row.reference_docname not in completed_lessons:
 				return False
 
 		if row.reference_doctype == "LMS Quiz":
@@ -0,0 +1,75 @@
+# Copyright (c) 2026, Frappe and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import getdate
+
+
+class LMSChartRollup(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_unique(
+		"LMS Chart Rollup", ["chart", "date"], constraint_name="unique_chart_date"
+	)
+
+
+def update_chart_rollups():
+	"""Rolls up the rows of the LMS dashboard charts into daily buckets.
+
+	The last rolled up day is rolled up again, as it may have been partial,
+	along with every day after it up to yesterday. Today is read live by
+	`get_chart_data`.
+	"""
+	for chart in frappe.get_all("Dashboard Chart", {"module": "LMS"}, pluck="name"):
+		update_chart_rollup(chart)
+
+
+def update_chart_rollup(chart):
+	chart = frappe.get_cached_doc("Dashboard Chart", chart)
+	if not chart.document_type or not chart.based_on:
+		return
+
+	last_date = frappe.db.get_value(
+		"LMS Chart Rollup", {"chart": chart.name}, "max(date)"
+	)
+	rows = get_daily_chart_data(chart, last_date, getdate())
+
+	filters = {"chart": chart.name}
+	if last_date:
+		filters["date"] = [">=", last_date]
+	frappe.db.delete("LMS Chart Rollup", filters)
+
+	for date, value, count in rows:
+		frappe.get_doc(
+			{
+				"doctype": "LMS Chart Rollup",
+				"chart": chart.name,
+				"date": date,
+				"value": value,
+				"document_count": count,
+			}
+		).db_insert()
+
+
+def get_daily_chart_data(chart, from_date=None, to_date=None):
+	"""Returns (date, sum, count) rows of the chart's document type grouped by day,
+	from `from_date` up to, but not including, `to_date`."""
+	datefield = chart.based_on
+	value_field = chart.value_based_on or "1"
+	filters = [[chart.document_type, "docstatus", "<", 2, False]]
+	if from_date:
+		filters.append([chart.document_type, datefield, ">=", from_date, False])
+	if to_date:
+		filters.append([chart.document_type, datefield, "<", to_date, False])
+
+	return frappe.db.get_all(
+		chart.document_type,
+		fields=[f"date({datefield}) as _unit", f"SUM({value_field})", "COUNT(*)"],
+		filters=filters,
+		group_by="_unit",
+		order_by="_unit asc",
+		as_list=True,
+	)
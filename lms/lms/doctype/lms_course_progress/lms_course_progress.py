@@ -3,12 +3,14 @@
 
 import frappe
 from frappe.model.document import Document
-from lms.lms.utils import get_course_progress
+from lms.lms.utils import increment_completed_lessons
 
 
 class LMSCourseProgress(Document):
 	def after_delete(self):
-		progress = get_course_progress(self.course, self.member)
+		if self.status != "Complete":
+			return
+
 		membership = frappe.db.get_value(
 			"LMS Enrollment",
 			{
@@ -17,4 +19,13 @@ class LMSCourseProgress(Document):
 			},
 			"name",
 		)
-		frappe.db.set_value("LMS Enrollment", membership, "progress", progress)
+		if membership:
+			increment_completed_lessons(membership, self.course, step=-1)
+
+
+def on_doctype_update():
+	frappe.db.add_unique(
+		"LMS Course Progress",
+		["member", "course", "lesson"],
+		constraint_name="unique_member_course_lesson",
+	)
@@ -4,6 +4,7 @@
 import frappe
 from frappe.model.document import Document
 from frappe.utils import cint
+from lms.lms.utils import get_review_rating_scale
 
 
 class LMSCourseReview(Document):
@@ -19,11 +20,7 @@ class LMSCourseReview(Document):
 
 @frappe.whitelist()
 def submit_review(rating, review, course):
-	out_of_ratings = frappe.db.get_all(
-		"DocField", {"parent": "LMS Course Review", "fieldtype": "Rating"}, ["options"]
-	)
-	out_of_ratings = (len(out_of_ratings) and out_of_ratings[0].options) or 5
-	rating = cint(rating) / out_of_ratings
+	rating = cint(rating) / get_review_rating_scale()
 	frappe.get_doc(
 		{"doctype": "LMS Course Review", "rating": rating, "review": review, "course": course}
 	).save(ignore_permissions=True)
@@ -4,6 +4,7 @@
 import frappe
 from frappe import _
 from frappe.model.document import Document
+from frappe.query_builder.functions import Avg, IfNull
 from frappe.utils import ceil
 
 
@@ -13,7 +14,8 @@ class LMSEnrollment(Document):
 		self.validate_membership_in_different_batch_same_course()
 
 	def on_update(self):
-		self.update_program_progress()
+		if self.has_value_changed("progress"):
+			self.update_program_progress()
 
 	def validate_membership_in_same_batch(self):
 		filters = {"member": self.member, "course": self.course, "name": ["!=", self.name]}
@@ -60,24 +62,45 @@ class LMSEnrollment(Document):
 			)
 
 	def update_program_progress(self):
-		programs = frappe.get_all(
-			"LMS Program Member", {"member": self.member}, ["parent", "name"]
+		"""Updates the progress of the member in the programs that include this course.
+
+		The average progress of the member across the courses of each program is
+		computed with one grouped query.
+		"""
+		ProgramMember = frappe.qb.DocType("LMS Program Member")
+		ProgramCourse = frappe.qb.DocType("LMS Program Course")
+		Enrollment = frappe.qb.DocType("LMS Enrollment")
+
+		programs = (
+			frappe.qb.from_(ProgramMember)
+			.inner_join(ProgramCourse)
+			.on(ProgramCourse.parent == ProgramMember.parent)
+			.select(ProgramMember.name, ProgramMember.parent, ProgramMember.progress)
+			.where(ProgramMember.member == self.member)
+			.where(ProgramCourse.course == self.course)
+			.run(as_dict=1)
 		)
+		if not programs:
+			return
 
-		for program in programs:
-			total_progress = 0
-			courses = frappe.get_all(
-				"LMS Program Course", {"parent": program.parent}, pluck="course"
+		total_progress = dict(
+			frappe.qb.from_(ProgramCourse)
+			.left_join(Enrollment)
+			.on((Enrollment.course == ProgramCourse.course) & (Enrollment.member == self.member))
+			.select(
+				ProgramCourse.parent, Avg(IfNull(Enrollment.progress, 0)).as_("progress")
 			)
-			for course in courses:
-				progress = frappe.db.get_value(
-					"LMS Enrollment", {"course": course, "member": self.member}, "progress"
-				)
-				progress = progress or 0
-				total_progress += progress
+			.where(ProgramCourse.parent.isin([program.parent for program in programs]))
+			.groupby(ProgramCourse.parent)
+			.run()
+		)
 
-			average_progress = ceil(total_progress / len(courses))
-			frappe.db.set_value("LMS Program Member", program.name, "progress", average_progress)
+		for program in programs:
+			average_progress = ceil(total_progress.get(program.parent) or 0)
+			if average_progress != program.progress:
+				frappe.db.set_value(
+					"LMS Program Member", program.name, "progress", average_progress
+				)
 
 
 @frappe.whitelist()
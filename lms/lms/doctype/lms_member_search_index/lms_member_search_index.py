@@ -0,0 +1,93 @@
+# Copyright (c) 2026, Frappe and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import cstr, create_batch
+
+USER_SEARCH_FIELDS = [
+	"first_name",
+	"last_name",
+	"full_name",
+	"email",
+	"preferred_location",
+	"dream_companies",
+]
+PROFILE_SEARCH_FIELDS = {
+	"Education Detail": ["institution_name", "location", "degree_type", "major"],
+	"Work Experience": ["title", "company"],
+	"Certification": ["certification_name", "organization"],
+	"Skills": ["skill_name"],
+	"Preferred Function": ["function"],
+	"Preferred Industry": ["industry"],
+}
+
+
+class LMSMemberSearchIndex(Document):
+	pass
+
+
+def on_doctype_update():
+	if not frappe.db.has_index("tabLMS Member Search Index", "search_text_fulltext"):
+		frappe.db.sql_ddl(
+			"ALTER TABLE `tabLMS Member Search Index` ADD FULLTEXT INDEX search_text_fulltext (search_text)"
+		)
+
+
+def update_member_search_index(user):
+	"""Writes the searchable profile of the user from the user document and its
+	profile tables."""
+	rows = []
+	for doctype in PROFILE_SEARCH_FIELDS:
+		rows.extend((doctype, row) for row in user.get_all_children(doctype))
+	set_member_search_index(user, rows)
+
+
+def set_member_search_index(user, rows):
+	values = {
+		"enabled": user.enabled,
+		"user_creation": user.creation,
+		"search_text": get_search_text(user, rows),
+	}
+	if frappe.db.exists("LMS Member Search Index", user.name):
+		frappe.db.set_value(
+			"LMS Member Search Index", user.name, values, update_modified=False
+		)
+	else:
+		frappe.get_doc(
+			{"doctype": "LMS Member Search Index", "user": user.name, **values}
+		).db_insert()
+
+
+def get_search_text(user, rows):
+	"""Returns the searchable text of a user. `rows` is a list of (doctype, row)
+	tuples of the profile tables of the user."""
+	values = [user.get(field) for field in USER_SEARCH_FIELDS]
+	for doctype, row in rows:
+		values.extend(row.get(field) for field in PROFILE_SEARCH_FIELDS[doctype])
+	return " ".join(cstr(value) for value in values if value).lower()
+
+
+def delete_member_search_index(user):
+	frappe.db.delete("LMS Member Search Index", {"user": user.name})
+
+
+def rebuild_member_search_index():
+	"""Rebuilds the index for all users, loading the profile tables of each
+	batch of users with one query per table."""
+	users = frappe.get_all(
+		"User", fields=["name", "enabled", "creation", *USER_SEARCH_FIELDS]
+	)
+	for batch in create_batch(users, 500):
+		names = [user.name for user in batch]
+		rows = {}
+		for doctype, fields in PROFILE_SEARCH_FIELDS.items():
+			for row in frappe.get_all(
+				doctype,
+				{"parent": ["in", names], "parenttype": "User"},
+				["parent", *fields],
+			):
+				rows.setdefault(row.parent, []).append((doctype, row))
+
+		for user in batch:
+			set_member_search_index(user, rows.get(user.name, []))
@@ -0,0 +1,14 @@
+# Copyright (c) 2026, Frappe and Contributors
+# See license.txt
+
+# import frappe
+from frappe.tests import UnitTestCase
+
+
+class TestLMSMemberSearchIndex(UnitTestCase):
+	"""
+	Unit tests for LMSMemberSearchIndex.
+	Use this class for testing individual functions and methods.
+	"""
+
+	pass
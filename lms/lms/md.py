@@ -11,22 +11,102 @@ Apps can provide a hook lms_markdown_macro_renderers, a
 dictionary mapping the macro name to the function that to render
 that macro. The function will get the argument passed to the macro
 as argument.
+
+The registry of renderers is resolved once per process for every
+version of the hooks, and the markdown pipelines are reused from a
+small pool instead of being built for every render.
+
+Macros whose output depends on the session user can be left as
+placeholders while rendering, so that the rest of the html can be
+cached and shared. The placeholders are filled in later using
+`render_deferred_macros`.
 """
 
 import html as HTML
 import re
+import threading
 import xml.etree.ElementTree as etree
+from contextlib import contextmanager
 
 import frappe
 import markdown
 from bs4 import BeautifulSoup
 from markdown import Extension
 from markdown.inlinepatterns import InlineProcessor
+from markdown.serializers import to_html_string
+
+
+# Macros that only depend on their argument. All other macros are
+# treated as dynamic and are deferred when rendering for the cache.
+STATIC_MACROS = ("YouTubeVideo", "Video", "Audio", "PDF", "Embed", "Assignment")
+
+DEFERRED_MACRO_RE = re.compile(r'<div data-lms-macro="([^"]*)"></div>')
+
+MARKDOWN_POOL_SIZE = 4
 
+_macro_registries = {}
+_markdown_pool = {}
+_markdown_pool_lock = threading.Lock()
 
-def markdown_to_html(text):
-	"""Renders markdown text into html."""
-	return markdown.markdown(text, extensions=["fenced_code", MacroExtension()])
+
+def markdown_to_html(text, defer_dynamic_macros=False):
+	"""Renders markdown text into html.
+
+	When `defer_dynamic_macros` is set, the macros that are not in
+	STATIC_MACROS are rendered as placeholders.
+	"""
+	return render_many([text], defer_dynamic_macros=defer_dynamic_macros)[0]
+
+
+def render_many(texts, defer_dynamic_macros=False):
+	"""Renders a list of markdown texts into html using a single pipeline.
+
+	Useful for bulk jobs like reindexing or exporting lessons.
+	"""
+	registry = get_macro_registry()
+	with markdown_instance(defer_dynamic_macros) as md:
+		md.macro_registry = registry
+		html = []
+		for text in texts:
+			md.reset()
+			html.append(md.convert(text or ""))
+		return html
+
+
+@contextmanager
+def markdown_instance(defer_dynamic_macros=False):
+	"""Yields a Markdown instance from the pool, creating one if the pool is empty."""
+	with _markdown_pool_lock:
+		pool = _markdown_pool.setdefault(defer_dynamic_macros, [])
+		md = pool.pop() if pool else None
+
+	if not md:
+		md = markdown.Markdown(
+			extensions=[
+				"fenced_code",
+				MacroExtension(defer_dynamic_macros=defer_dynamic_macros),
+			]
+		)
+
+	try:
+		yield md
+	finally:
+		md.macro_registry = None
+		with _markdown_pool_lock:
+			if len(pool) < MARKDOWN_POOL_SIZE:
+				pool.append(md)
+
+
+def render_deferred_macros(html):
+	"""Renders the macro placeholders left in the html by `markdown_to_html`."""
+
+	registry = get_macro_registry()
+
+	def replace(match):
+		macro, argument = HTML.unescape(match.group(1)).split("|", 1)
+		return render_macro_html(macro, argument, registry)
+
+	return DEFERRED_MACRO_RE.sub(replace, html)
 
 
 def find_macros(text):
@@ -62,15 +142,27 @@ def _remove_quotes(value):
 
 
 def get_macro_registry():
+	"""Returns the map of macro name to its renderer.
+
+	The renderers are resolved once per process for each version of the
+	hooks, as the same process can serve sites with different apps.
+	"""
 	d = frappe.get_hooks("lms_markdown_macro_renderers") or {}
-	return {name: frappe.get_attr(klass[0]) for name, klass in d.items()}
+	key = tuple(sorted((name, tuple(klass)) for name, klass in d.items()))
+
+	registry = _macro_registries.get(key)
+	if registry is None:
+		registry = {name: frappe.get_attr(klass[0]) for name, klass in d.items()}
+		_macro_registries[key] = registry
+	return registry
 
 
-def render_macro(macro_name, macro_argument):
+def render_macro(macro_name, macro_argument, registry=None):
 	# stripping the quotes on either side of the argument
 	macro_argument = _remove_quotes(macro_argument)
 
-	registry = get_macro_registry()
+	if registry is None:
+		registry = get_macro_registry()
 	if macro_name in registry:
 		return registry[macro_name](macro_argument)
 	else:
@@ -83,10 +175,15 @@ MACRO_RE = r"{{ *(\w+)\(([^{}]*)\) *}}"
 class MacroExtension(Extension):
 	"""MacroExtension is a markdown extension to support macro syntax."""
 
+	def __init__(self, defer_dynamic_macros=False, **kwargs):
+		self.defer_dynamic_macros = defer_dynamic_macros
+		super().__init__(**kwargs)
+
 	def extendMarkdown(self, md):
 		self.md = md
 		pattern = MacroInlineProcessor(MACRO_RE)
 		pattern.md = md
+		pattern.defer_dynamic_macros = self.defer_dynamic_macros
 		md.inlinePatterns.register(pattern, "macro", 75)
 
 
@@ -98,15 +195,58 @@ class MacroInlineProcessor(InlineProcessor):
 	def handleMatch(self, m, data):
 		"""Handles each macro match and return rendered contents
 		for that macro as an etree node.
+
+		The output of trusted renderers is stored in the html stash as is
+		and a placeholder is returned instead.
 		"""
 		macro = m.group(1)
 		arg = m.group(2)
-		html = render_macro(macro, arg)
-		html = sanitize_html(str(html), macro)
-		e = etree.fromstring(html)
+
+		if getattr(self, "defer_dynamic_macros", False) and macro not in STATIC_MACROS:
+			e = etree.Element("div", {"data-lms-macro": f"{macro}|{_remove_quotes(arg)}"})
+			return e, m.start(0), m.end(0)
+
+		registry = getattr(self.md, "macro_registry", None) or get_macro_registry()
+		if is_trusted_renderer(registry.get(macro)):
+			html = wrap_macro_html(render_macro(macro, arg, registry), macro)
+			return self.md.htmlStash.store(html), m.start(0), m.end(0)
+
+		e = render_macro_element(macro, arg, registry)
 		return e, m.start(0), m.end(0)
 
 
+def trusted_renderer(renderer):
+	"""Marks a macro renderer as trusted.
+
+	The output of a trusted renderer must be well-formed html. It is used
+	without passing it through the sanitizer.
+	"""
+	renderer.is_trusted = True
+	return renderer
+
+
+def is_trusted_renderer(renderer):
+	return getattr(renderer, "is_trusted", False)
+
+
+def render_macro_html(macro, arg, registry=None):
+	"""Renders the macro as html markup."""
+	if registry is None:
+		registry = get_macro_registry()
+
+	if is_trusted_renderer(registry.get(macro)):
+		return wrap_macro_html(render_macro(macro, arg, registry), macro)
+
+	return to_html_string(render_macro_element(macro, arg, registry))
+
+
+def render_macro_element(macro, arg, registry=None):
+	"""Renders the macro as an etree node."""
+	html = render_macro(macro, arg, registry)
+	html = sanitize_html(str(html), macro)
+	return etree.fromstring(html)
+
+
 def sanitize_html(html, macro):
 	"""Sanitize the html using BeautifulSoup.
 
@@ -116,10 +256,12 @@ def sanitize_html(html, macro):
 	"""
 	soup = BeautifulSoup(html, features="lxml")
 	nodes = soup.body.children
+	return wrap_macro_html("\n".join(str(node) for node in nodes), macro)
+
+
+def wrap_macro_html(html, macro):
 	classname = ""
 	if macro == "YouTubeVideo":
 		classname = "lesson-video"
 
-	return (
-		"<div class='" + classname + "'>" + "\n".join(str(node) for node in nodes) + "</div>"
-	)
+	return "<div class='" + classname + "'>" + str(html) + "</div>"
@@ -12,4 +12,13 @@ frappe.query_reports["Course Progress Summary"] = {
 			reqd: 1,
 		},
 	],
+	onload(report) {
+		report.page.add_inner_button(__("Export CSV"), () => {
+			const course = report.get_filter_value("course");
+			window.open(
+				"/api/method/lms.lms.report.course_progress_summary.course_progress_summary.export_csv?" +
+					new URLSearchParams({ course: course || "" })
+			);
+		});
+	},
 };
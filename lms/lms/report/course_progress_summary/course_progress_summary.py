@@ -1,48 +1,114 @@
 # Copyright (c) 2013, FOSS United and contributors
 # License: MIT. See LICENSE
 
+import csv
+import io
+import tempfile
+
 import frappe
 from frappe import _
+from frappe.query_builder import Case
+from frappe.query_builder.functions import Count
 from frappe.utils import cint
+from werkzeug.wrappers import Response
+from werkzeug.wsgi import wrap_file
+
+PAGE_LENGTH = 5000
+# rows shown in desk, the full report is available through export_csv
+REPORT_ROW_LIMIT = 5000
+PROGRESS_BUCKETS = ["0-10", "11-40", "41-70", "71-99", "100"]
 
 
 def execute(filters=None):
 	columns, data = [], []
 	columns = get_columns()
-	data = get_data(filters)
-	charts = get_charts(data)
-	return columns, data, [], charts
-
-
-def get_data(filters=None):
-	summary = []
-	query_filter = {}
-	if filters:
-		query_filter = {"course": filters.course}
-
-	memberships = frappe.get_all(
-		"LMS Enrollment",
-		query_filter,
-		["name", "course", "member", "member_name", "progress"],
-		order_by="course",
-	)
+	data = get_data(filters, page_length=REPORT_ROW_LIMIT + 1)
+	message = None
+	if len(data) > REPORT_ROW_LIMIT:
+		data = data[:REPORT_ROW_LIMIT]
+		message = _(
+			"Showing the first {0} enrollments. Use Export CSV to download all of them."
+		).format(REPORT_ROW_LIMIT)
+	charts = get_charts(filters)
+	return columns, data, message, charts
 
-	for membership in memberships:
-		summary.append(
-			frappe._dict(
-				{
-					"course": membership.name,
-					"course_name": frappe.db.get_value("LMS Course", membership.course, "title"),
-					"member": membership.member,
-					"member_name": membership.member_name,
-					"progress": cint(membership.progress),
-				}
-			)
+
+def get_data(filters=None, after=None, page_length=PAGE_LENGTH):
+	"""Returns a page of enrollments with their course titles, ordered by
+	enrollment. Pass the `name` of the last row as `after` for the next page."""
+	Enrollment = frappe.qb.DocType("LMS Enrollment")
+	Course = frappe.qb.DocType("LMS Course")
+
+	query = (
+		frappe.qb.from_(Enrollment)
+		.inner_join(Course)
+		.on(Course.name == Enrollment.course)
+		.select(
+			Enrollment.name,
+			Enrollment.course,
+			Course.title.as_("course_name"),
+			Enrollment.member,
+			Enrollment.member_name,
+			Enrollment.progress,
 		)
+		.orderby(Enrollment.name)
+		.limit(page_length)
+	)
+	if filters and filters.get("course"):
+		query = query.where(Enrollment.course == filters.get("course"))
+	if after:
+		query = query.where(Enrollment.name > after)
 
+	summary = query.run(as_dict=1)
+	for row in summary:
+		row.progress = cint(row.progress)
 	return summary
 
 
+def get_pages(filters=None, page_length=PAGE_LENGTH):
+	"""Yields the rows of the report one page at a time."""
+	after = None
+	while True:
+		page = get_data(filters, after, page_length)
+		if not page:
+			return
+		yield page
+		if len(page) < page_length:
+			return
+		after = page[-1].name
+
+
+@frappe.whitelist()
+def export_csv(course=None):
+	"""Streams the report as a CSV file.
+
+	The rows are written to a temporary file one page at a time and the file
+	is streamed in the response, so memory does not grow with the number of
+	enrollments.
+	"""
+	if not frappe.get_doc("Report", "Course Progress Summary").is_permitted():
+		frappe.throw(_("Not permitted"), frappe.PermissionError)
+
+	columns = get_columns()
+	fieldnames = [column["fieldname"] for column in columns]
+	file = tempfile.TemporaryFile()
+	text = io.TextIOWrapper(file, encoding="utf-8", newline="")
+	writer = csv.writer(text)
+	writer.writerow([column["label"] for column in columns])
+	for page in get_pages(frappe._dict(course=course)):
+		writer.writerows([[row[fieldname] for fieldname in fieldnames] for row in page])
+	text.detach()
+	file.seek(0)
+
+	response = Response(
+		wrap_file(frappe.local.request.environ, file),
+		mimetype="text/csv",
+		direct_passthrough=True,
+	)
+	response.headers["Content-Disposition"] = 'attachment; filename="course_progress_summary.csv"'
+	return response
+
+
 def get_columns():
 	return [
 		{
@@ -80,41 +146,37 @@ def get_columns():
 	]
 
 
-def get_charts(data):
-	if not data:
-		return None
+def get_charts(filters=None):
+	"""Returns a pie chart of the enrollments bucketed by progress, counted in SQL."""
+	Enrollment = frappe.qb.DocType("LMS Enrollment")
+	bucket = (
+		Case()
+		.when(Enrollment.progress >= 100, "100")
+		.when(Enrollment.progress >= 71, "71-99")
+		.when(Enrollment.progress >= 41, "41-70")
+		.when(Enrollment.progress >= 11, "11-40")
+		.else_("0-10")
+	)
 
-	completed = 0
-	less_than_hundred = 0
-	less_than_seventy_one = 0
-	less_than_forty_one = 0
-	less_than_eleven = 0
-
-	for row in data:
-		if row.progress == 100:
-			completed += 1
-		elif row.progress < 100 and row.progress > 70:
-			less_than_hundred += 1
-		elif row.progress < 71 and row.progress > 40:
-			less_than_seventy_one += 1
-		elif row.progress < 41 and row.progress > 10:
-			less_than_forty_one += 1
-		elif row.progress < 11:
-			less_than_eleven += 1
+	query = (
+		frappe.qb.from_(Enrollment)
+		.select(bucket.as_("bucket"), Count("*"))
+		.groupby(bucket)
+	)
+	if filters and filters.get("course"):
+		query = query.where(Enrollment.course == filters.get("course"))
+
+	counts = dict(query.run())
+	if not counts:
+		return None
 
 	charts = {
 		"data": {
-			"labels": ["0-10", "11-40", "41-70", "71-99", "100"],
+			"labels": PROGRESS_BUCKETS,
 			"datasets": [
 				{
 					"name": "Progress (%)",
-					"values": [
-						less_than_eleven,
-						less_than_forty_one,
-						less_than_seventy_one,
-						less_than_hundred,
-						completed,
-					],
+					"values": [counts.get(bucket, 0) for bucket in PROGRESS_BUCKETS],
 				}
 			],
 		},
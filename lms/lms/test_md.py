@@ -0,0 +1,57 @@
+import os
+import time
+import unittest
+
+from .md import markdown_to_html, render_deferred_macros, render_many
+
+LESSON_TEXT = """# Lesson
+
+Some **bold** text and a list:
+
+- one
+- two
+
+```
+print("hello")
+```
+
+{{ YouTubeVideo('abcd1234') }}
+"""
+
+
+class TestMarkdown(unittest.TestCase):
+	def test_deferred_macros(self):
+		text = "{{ YouTubeVideo('abcd1234') }}\n\nText {{ Quiz('test-quiz') }}"
+		html = markdown_to_html(text, defer_dynamic_macros=True)
+
+		self.assertIn("youtube.com/embed/abcd1234", html)
+		self.assertIn('data-lms-macro="Quiz|test-quiz"', html)
+		self.assertNotIn("data-lms-macro", render_deferred_macros(html))
+
+	def test_trusted_renderer(self):
+		html = markdown_to_html("{{ YouTubeVideo('abcd1234') }}")
+		self.assertIn("<div class='lesson-video'>", html)
+		self.assertIn('class="youtube-video"', html)
+
+	def test_render_many(self):
+		texts = ["*one*", LESSON_TEXT, ""]
+		self.assertEqual(render_many(texts), [markdown_to_html(text) for text in texts])
+
+	def test_render_many_reuses_instances(self):
+		"""Instances taken from the pool are reset between texts."""
+		html = render_many([LESSON_TEXT] * 20)
+		self.assertEqual(html, [markdown_to_html(LESSON_TEXT)] * 20)
+		self.assertIn("<h1>Lesson</h1>", html[-1])
+		self.assertIn("<strong>bold</strong>", html[-1])
+
+
+@unittest.skipUnless(os.environ.get("LMS_BENCHMARK"), "set LMS_BENCHMARK=1 to run")
+class BenchmarkMarkdown(unittest.TestCase):
+	def test_render_throughput(self):
+		"""Reports the markdown renders per second, without a threshold."""
+		count = 200
+		start = time.perf_counter()
+		render_many([LESSON_TEXT] * count)
+		renders_per_second = count / (time.perf_counter() - start)
+
+		print(f"\nmarkdown renders per second: {renders_per_second:.0f}")
@@ -1,17 +1,28 @@
+import base64
+import copy
+import hashlib
+import multiprocessing
+import os
+import pickle
 import re
 import string
 import frappe
 import json
 import razorpay
 import requests
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from frappe import _
 from frappe.desk.doctype.dashboard_chart.dashboard_chart import get_result
 from frappe.desk.doctype.notification_log.notification_log import make_notification_logs
 from frappe.desk.search import get_user_groups
+from frappe.query_builder import Case
+from frappe.query_builder.functions import Cast, Count, IfNull, Round
 from frappe.desk.notifications import extract_mentions
 from frappe.utils import (
+	add_days,
 	add_months,
 	cint,
+	create_batch,
 	cstr,
 	ceil,
 	flt,
@@ -27,10 +38,51 @@ from frappe.utils import (
 	format_datetime,
 )
 from frappe.utils.dateutils import get_period
-from lms.lms.md import find_macros, markdown_to_html
+from lms.lms.doctype.lms_chart_rollup.lms_chart_rollup import get_daily_chart_data
+from lms.lms.md import find_macros, markdown_to_html, render_deferred_macros
 
 RE_SLUG_NOTALLOWED = re.compile("[^a-z0-9]+")
 
+CATALOG_CACHE_VERSION_KEY = "lms_catalog_version"
+CATALOG_CACHE_TTL = 6 * 60 * 60
+COURSE_STRUCTURE_CACHE_TTL = 24 * 60 * 60
+LESSON_HTML_CACHE_TTL = 24 * 60 * 60
+CURRENT_LESSON_BUFFER_KEY = "lms_current_lesson_buffer"
+ROLE_DIRECTORY_KEY = "lms_role_directory"
+STAFF_ROLES = ["Moderator", "Course Creator", "Batch Evaluator"]
+PLATFORM_COUNTERS_KEY = "lms_platform_counters"
+PLATFORM_COUNTERS_TTL = 60 * 60
+
+LESSON_FIELDS = [
+	"name",
+	"title",
+	"include_in_preview",
+	"body",
+	"creation",
+	"youtube",
+	"quiz_id",
+	"question",
+	"file_type",
+	"instructor_notes",
+	"course",
+	"content",
+	"icon",
+]
+
+LESSON_MEDIA_MACROS = {
+	"YouTubeVideo": "video",
+	"Video": "video",
+	"Audio": "audio",
+	"PDF": "pdf",
+	"Embed": "embed",
+}
+LESSON_MEDIA_FILE_TYPES = {
+	"video": ["mp4", "webm", "ogg", "mov"],
+	"audio": ["mp3", "wav"],
+	"pdf": ["pdf"],
+	"image": ["jpg", "jpeg", "png", "gif", "webp", "svg"],
+}
+
 
 def slugify(title, used_slugs=None):
 	"""Converts title to a slug.
@@ -84,6 +136,7 @@ def get_membership(course, member=None, batch=None):
 			["name", "batch_old", "current_lesson", "member_type", "progress", "member"],
 			as_dict=True,
 		)
+		merge_buffered_current_lesson(membership, course, member)
 
 		if membership and membership.batch_old:
 			membership.batch_title = frappe.db.get_value(
@@ -94,6 +147,91 @@ def get_membership(course, member=None, batch=None):
 	return False
 
 
+def buffer_current_lesson(course, lesson, member=None):
+	"""Buffers the current lesson of the member in redis.
+
+	The buffer is written to the enrollments by `flush_current_lessons`, the
+	last lesson buffered for a course wins.
+	"""
+	if not member:
+		member = frappe.session.user
+
+	frappe.cache().hset(
+		CURRENT_LESSON_BUFFER_KEY, get_current_lesson_buffer_field(course, member), lesson
+	)
+
+
+def get_buffered_current_lesson(course, member=None):
+	if not member:
+		member = frappe.session.user
+
+	return frappe.cache().hget(
+		CURRENT_LESSON_BUFFER_KEY, get_current_lesson_buffer_field(course, member)
+	)
+
+
+def get_buffered_current_lessons(courses, member=None):
+	"""Returns a map of course to the buffered current lesson of the member,
+	read with a single HMGET."""
+	if not member:
+		member = frappe.session.user
+	if not courses:
+		return {}
+
+	cache = frappe.cache()
+	values = cache.hmget(
+		cache.make_key(CURRENT_LESSON_BUFFER_KEY),
+		[get_current_lesson_buffer_field(course, member) for course in courses],
+	)
+	return {
+		course: pickle.loads(value) for course, value in zip(courses, values) if value
+	}
+
+
+def merge_buffered_current_lesson(membership, course, member=None):
+	"""Sets the buffered current lesson on the membership, if there is one."""
+	if not membership:
+		return membership
+
+	lesson = get_buffered_current_lesson(course, member or membership.member)
+	if lesson:
+		membership.current_lesson = lesson
+	return membership
+
+
+def get_current_lesson_buffer_field(course, member):
+	return f"{member}::{course}"
+
+
+def flush_current_lessons():
+	"""Writes the buffered current lessons to the enrollments in a single transaction.
+
+	The buffer is renamed before it is read, so lessons buffered during the
+	flush are kept for the next run. A buffer left behind by a failed run is
+	flushed first.
+	"""
+	cache = frappe.cache()
+	flushing_key = f"{CURRENT_LESSON_BUFFER_KEY}:flushing"
+
+	if not cache.exists(flushing_key):
+		if not cache.exists(CURRENT_LESSON_BUFFER_KEY):
+			return
+		cache.rename(cache.make_key(CURRENT_LESSON_BUFFER_KEY), cache.make_key(flushing_key))
+
+	Enrollment = frappe.qb.DocType("LMS Enrollment")
+	for field, lesson in (cache.hgetall(flushing_key) or {}).items():
+		member, course = frappe.safe_decode(field).split("::", 1)
+		(
+			frappe.qb.update(Enrollment)
+			.set(Enrollment.current_lesson, lesson)
+			.where((Enrollment.member == member) & (Enrollment.course == course))
+			.run()
+		)
+
+	frappe.db.commit()
+	cache.delete_value(flushing_key)
+
+
 def get_chapters(course):
 	"""Returns all chapters of this course."""
 	if not course:
@@ -123,50 +261,142 @@ def get_lessons(course, chapter=None, get_details=True, progress=False):
 		else:
 			return frappe.db.count("Lesson Reference", {"parent": chapter.name})
 
-	for chapter in get_chapters(course):
-		if get_details:
-			lessons += get_lesson_details(chapter, progress=progress)
-		else:
+	chapters = get_chapters(course)
+	if get_details:
+		chapter_lessons = get_chapter_lessons(chapters)
+		for chapter in chapters:
+			lessons += chapter_lessons.get(chapter.name, [])
+
+		if progress:
+			set_lesson_progress(lessons, course)
+	else:
+		for chapter in chapters:
 			lesson_count += frappe.db.count("Lesson Reference", {"parent": chapter.name})
 
 	return lessons if get_details else lesson_count
 
 
 def get_lesson_details(chapter, progress=False):
-	lessons = []
-	lesson_list = frappe.get_all(
-		"Lesson Reference", {"parent": chapter.name}, ["lesson", "idx"], order_by="idx"
-	)
-	for row in lesson_list:
-		lesson_details = frappe.db.get_value(
-			"Course Lesson",
-			row.lesson,
-			[
-				"name",
-				"title",
-				"include_in_preview",
-				"body",
-				"creation",
-				"youtube",
-				"quiz_id",
-				"question",
-				"file_type",
-				"instructor_notes",
-				"course",
-				"content",
-			],
-			as_dict=True,
+	lessons = get_chapter_lessons([chapter]).get(chapter.name, [])
+	if progress and lessons:
+		set_lesson_progress(lessons, lessons[0].course)
+	return lessons
+
+
+def get_chapter_lessons(chapters):
+	"""Returns a map of chapter to the details of its lessons, fetched in a single query."""
+	chapter_lessons = frappe._dict()
+	if not chapters:
+		return chapter_lessons
+
+	chapter_index = {chapter.name: chapter.idx for chapter in chapters}
+	LessonReference = frappe.qb.DocType("Lesson Reference")
+	Lesson = frappe.qb.DocType("Course Lesson")
+	rows = (
+		frappe.qb.from_(LessonReference)
+		.inner_join(Lesson)
+		.on(Lesson.name == LessonReference.lesson)
+		.select(
+			*[Lesson[field] for field in LESSON_FIELDS],
+			LessonReference.parent.as_("reference_parent"),
+			LessonReference.idx.as_("reference_idx"),
 		)
-		lesson_details.number = f"{chapter.idx}.{row.idx}"
-		lesson_details.icon = get_lesson_icon(lesson_details.body, lesson_details.content)
+		.where(LessonReference.parent.isin(list(chapter_index)))
+		.orderby(LessonReference.idx)
+		.run(as_dict=1)
+	)
 
-		if progress:
-			lesson_details.is_complete = get_progress(lesson_details.course, lesson_details.name)
+	for lesson in rows:
+		chapter = lesson.pop("reference_parent")
+		lesson_idx = lesson.pop("reference_idx")
+		lesson.number = f"{chapter_index[chapter]}.{lesson_idx}"
+		if not lesson.icon:
+			lesson.icon = get_lesson_icon(lesson.body, lesson.content)
+		chapter_lessons.setdefault(chapter, []).append(lesson)
+
+	return chapter_lessons
 
-		lessons.append(lesson_details)
+
+def set_lesson_progress(lessons, course, member=None):
+	"""Sets `is_complete` on each lesson from a single query on the course progress."""
+	completed_lessons = get_completed_lessons(course, member)
+	for lesson in lessons:
+		lesson.is_complete = lesson.name in completed_lessons
 	return lessons
 
 
+def get_completed_lessons(course=None, member=None, lessons=None):
+	"""Returns the set of lessons completed by the member, fetched with a single query.
+
+	`course` can be a course or a list of courses, such as the courses of a
+	batch. Pass `lessons` to only look up those lessons.
+	"""
+	if not member:
+		member = frappe.session.user
+
+	if member == "Guest" or (lessons is not None and not lessons):
+		return set()
+
+	filters = {"member": member}
+	if isinstance(course, (list, tuple, set)):
+		filters["course"] = ["in", list(course)]
+	elif course:
+		filters["course"] = course
+
+	if lessons is not None:
+		filters["lesson"] = ["in", list(lessons)]
+
+	return set(frappe.get_all("LMS Course Progress", filters, pluck="lesson"))
+
+
+def get_lesson_metadata(body, content):
+	"""Returns the metadata derived from the body or the content of a lesson.
+
+	It has the icon of the lesson, the kinds of media in it and the quizzes,
+	assignments and exercises it refers to.
+	"""
+	metadata = frappe._dict(
+		icon=get_lesson_icon(body, content),
+		media=[],
+		quizzes=[],
+		assignments=[],
+		exercises=[],
+	)
+
+	def add(key, value):
+		if value and value not in metadata[key]:
+			metadata[key].append(value)
+
+	if content:
+		for block in json.loads(content).get("blocks") or []:
+			data = block.get("data") or {}
+			if block.get("type") == "quiz":
+				add("quizzes", data.get("quiz"))
+
+			elif block.get("type") == "upload":
+				file_type = (data.get("file_type") or "").lower()
+				for kind, file_types in LESSON_MEDIA_FILE_TYPES.items():
+					if file_type in file_types:
+						add("media", kind)
+
+			elif block.get("type") == "embed":
+				add("media", "video" if data.get("service") in ["youtube", "vimeo"] else "embed")
+
+		return metadata
+
+	for name, argument in find_macros(body):
+		if name in LESSON_MEDIA_MACROS:
+			add("media", LESSON_MEDIA_MACROS[name])
+		elif name == "Quiz":
+			add("quizzes", argument)
+		elif name == "Assignment":
+			add("assignments", argument)
+		elif name == "Exercise":
+			add("exercises", argument)
+
+	return metadata
+
+
 def get_lesson_icon(body, content):
 	if content:
 		content = json.loads(content)
@@ -235,30 +465,148 @@ def get_students(course, batch=None):
 	return frappe.get_all("LMS Enrollment", filters, ["member"])
 
 
+def get_review_rating_scale():
+	"""Returns the number of stars of the rating field on course reviews."""
+	field = frappe.get_meta("LMS Course Review").get("fields", {"fieldtype": "Rating"})
+	return cint(field and field[0].options) or 5
+
+
 def get_average_rating(course):
-	ratings = [review.rating for review in get_reviews(course)]
-	if not len(ratings):
+	rating = frappe.db.get_value(
+		"LMS Course", course, ["rating_sum", "rating_count"], as_dict=True
+	)
+	if not rating or not rating.rating_count:
 		return None
-	return sum(ratings) / len(ratings)
+	return rating.rating_sum / rating.rating_count
 
 
-@frappe.whitelist(allow_guest=True)
-def get_reviews(course):
-	reviews = frappe.get_all(
+def update_course_rating(course):
+	"""Stores the number of reviews, the sum of their ratings and the number of
+	reviews per star on the course, counted with one grouped query."""
+	rating_scale = get_review_rating_scale()
+	rows = frappe.get_all(
 		"LMS Course Review",
 		{"course": course},
-		["review", "rating", "owner", "creation"],
-		order_by="creation desc",
+		["rating", "count(name) as count"],
+		group_by="rating",
 	)
 
-	out_of_ratings = frappe.db.get_all(
-		"DocField", {"parent": "LMS Course Review", "fieldtype": "Rating"}, ["options"]
+	rating_count, rating_sum, histogram = 0, 0, {}
+	for row in rows:
+		rating = flt(row.rating) * rating_scale
+		stars = cstr(cint(round(rating)))
+		histogram[stars] = histogram.get(stars, 0) + row.count
+		rating_count += row.count
+		rating_sum += rating * row.count
+
+	average = rating_sum / rating_count if rating_count else 0
+	frappe.db.set_value(
+		"LMS Course",
+		course,
+		{
+			"rating_count": rating_count,
+			"rating_sum": rating_sum,
+			"rating_histogram": json.dumps(histogram),
+			"rating": flt(average, frappe.get_system_settings("float_precision") or 3),
+		},
+		update_modified=False,
+	)
+	clear_catalog_cache()
+
+
+def on_course_review_change(doc, method=None):
+	"""Updates the rating aggregates of the course of a review."""
+	update_course_rating(doc.course)
+	previous = doc.get_doc_before_save()
+	if previous and previous.course != doc.course:
+		update_course_rating(previous.course)
+
+
+@frappe.whitelist(allow_guest=True)
+def get_reviews(course):
+	return format_reviews(query_reviews(course))
+
+
+@frappe.whitelist(allow_guest=True)
+def get_paginated_reviews(course, cursor=None, page_length=20):
+	"""Returns a page of the reviews of the course, latest first.
+
+	The returned `cursor` is passed back to fetch the next page and is None on
+	the last page.
+	"""
+	page_length = min(cint(page_length) or 20, 100)
+	after = decode_catalog_cursor(cursor) if cursor else None
+	reviews = query_reviews(course, after=after, limit=page_length + 1)
+
+	next_cursor = None
+	if len(reviews) > page_length:
+		reviews = reviews[:page_length]
+		next_cursor = encode_catalog_cursor(reviews[-1].creation, reviews[-1].name)
+
+	return {"reviews": format_reviews(reviews), "cursor": next_cursor}
+
+
+@frappe.whitelist(allow_guest=True)
+def get_review_summary(course, top=3):
+	"""Returns the latest `top` reviews of the course with its average rating
+	and the share of reviews per star."""
+	reviews = query_reviews(course, limit=min(cint(top) or 3, 20))
+
+	return {
+		"reviews": format_reviews(reviews),
+		"rating": get_average_rating(course) or 0,
+		"rating_count": cint(frappe.db.get_value("LMS Course", course, "rating_count")),
+		"histogram": get_sorted_reviews(course),
+	}
+
+
+def query_reviews(course, after=None, limit=None):
+	"""Returns the reviews of the course with their reviewers, joined in one query.
+
+	`after` is the (creation, name) of the review to continue after.
+	"""
+	Review = frappe.qb.DocType("LMS Course Review")
+	User = frappe.qb.DocType("User")
+	query = (
+		frappe.qb.from_(Review)
+		.left_join(User)
+		.on(User.name == Review.owner)
+		.select(
+			Review.name,
+			Review.review,
+			Review.rating,
+			Review.owner,
+			Review.creation,
+			User.username,
+			User.full_name,
+			User.user_image,
+		)
+		.where(Review.course == course)
+		.orderby(Review.creation, order=frappe.qb.desc)
+		.orderby(Review.name, order=frappe.qb.desc)
 	)
-	out_of_ratings = (len(out_of_ratings) and out_of_ratings[0].options) or 5
+	if after:
+		creation, name = after
+		query = query.where(
+			(Review.creation < creation)
+			| ((Review.creation == creation) & (Review.name < name))
+		)
+	if limit:
+		query = query.limit(limit)
+
+	return query.run(as_dict=1)
+
+
+def format_reviews(reviews):
+	"""Sets the rating in stars, the reviewer details and a readable date on the reviews."""
+	rating_scale = get_review_rating_scale()
 	for review in reviews:
-		review.rating = review.rating * out_of_ratings
-		review.owner_details = frappe.db.get_value(
-			"User", review.owner, ["name", "username", "full_name", "user_image"], as_dict=True
+		review.rating = review.rating * rating_scale
+		review.owner_details = frappe._dict(
+			name=review.owner,
+			username=review.pop("username"),
+			full_name=review.pop("full_name"),
+			user_image=review.pop("user_image"),
 		)
 		review.creation = pretty_date(review.creation)
 
@@ -266,17 +614,16 @@ def get_reviews(course):
 
 
 def get_sorted_reviews(course):
-	rating_count = rating_percent = frappe._dict()
-	keys = ["5.0", "4.0", "3.0", "2.0", "1.0"]
-	for key in keys:
-		rating_count[key] = 0
-
-	reviews = get_reviews(course)
-	for review in reviews:
-		rating_count[cstr(review.rating)] += 1
+	rating_percent = frappe._dict()
+	rating = frappe.db.get_value(
+		"LMS Course", course, ["rating_count", "rating_histogram"], as_dict=True
+	)
+	rating_count = rating.rating_count if rating else 0
+	histogram = json.loads((rating and rating.rating_histogram) or "{}")
 
-	for key in keys:
-		rating_percent[key] = rating_count[key] / len(reviews) * 100
+	for stars in range(5, 0, -1):
+		count = histogram.get(cstr(stars), 0)
+		rating_percent[f"{stars}.0"] = count / rating_count * 100 if rating_count else 0
 
 	return rating_percent
 
@@ -292,6 +639,12 @@ def is_certified(course):
 
 def get_lesson_index(lesson_name):
 	"""Returns the {chapter_index}.{lesson_index} for the lesson."""
+	course = frappe.db.get_value("Course Lesson", lesson_name, "course")
+	if course:
+		entry = get_course_lesson_index(course).by_lesson.get(lesson_name)
+		if entry:
+			return entry.number.replace(".", "-")
+
 	lesson = frappe.db.get_value(
 		"Lesson Reference", {"lesson": lesson_name}, ["idx", "parent"], as_dict=True
 	)
@@ -307,6 +660,68 @@ def get_lesson_index(lesson_name):
 	return f"{chapter.idx}-{lesson.idx}"
 
 
+def get_course_lesson_index(course):
+	"""Returns the ordered index of the lessons of the course.
+
+	The index maps lesson numbers ({chapter_index}.{lesson_index}) and lesson
+	names to entries holding the lesson, its chapter and the numbers of the
+	previous and next lessons. `chapters` maps chapter indexes to chapters.
+	It is cached until the structure of the course changes.
+	"""
+	return get_versioned_cache(
+		f"lms_lesson_index:{course}",
+		get_course_structure_version_key(course),
+		lambda: build_course_lesson_index(course),
+		expires_in_sec=COURSE_STRUCTURE_CACHE_TTL,
+		deep_copy=False,
+	)
+
+
+def build_course_lesson_index(course):
+	ChapterReference = frappe.qb.DocType("Chapter Reference")
+	LessonReference = frappe.qb.DocType("Lesson Reference")
+	rows = (
+		frappe.qb.from_(ChapterReference)
+		.left_join(LessonReference)
+		.on(LessonReference.parent == ChapterReference.chapter)
+		.select(
+			ChapterReference.chapter,
+			ChapterReference.idx.as_("chapter_idx"),
+			LessonReference.lesson,
+			LessonReference.idx.as_("lesson_idx"),
+		)
+		.where(ChapterReference.parent == course)
+		.orderby(ChapterReference.idx)
+		.orderby(LessonReference.idx)
+		.run(as_dict=1)
+	)
+
+	index = frappe._dict(chapters={}, by_number={}, by_lesson={})
+	entries = []
+	for row in rows:
+		index.chapters[cint(row.chapter_idx)] = row.chapter
+		if row.lesson:
+			entries.append(
+				frappe._dict(
+					number=f"{row.chapter_idx}.{row.lesson_idx}",
+					lesson=row.lesson,
+					chapter=row.chapter,
+				)
+			)
+
+	for position, entry in enumerate(entries):
+		entry.prev = entries[position - 1].number if position > 0 else None
+		entry.next = entries[position + 1].number if position + 1 < len(entries) else None
+		index.by_number[entry.number] = entry
+		index.by_lesson[entry.lesson] = entry
+
+	return index
+
+
+def get_lesson_number(chapter, lesson):
+	return f"{cint(chapter)}.{cint(lesson)}"
+
+
 def get_lesson_url(course, lesson_number):
 	if not lesson_number:
 		return
@@ -348,7 +763,25 @@ def render_html(lesson):
 		assignment = "{{ Assignment('" + lesson.question + "-" + lesson.file_type + "') }}"
 		text = text + assignment
 
-	return markdown_to_html(text)
+	return render_lesson_markdown(text)
+
+
+def render_lesson_markdown(text):
+	"""Renders the markdown of a lesson into html.
+
+	The html is cached by the hash of the text. Macros that depend on the
+	session user are left as placeholders in the cache and rendered on
+	every call.
+	"""
+	text_hash = hashlib.sha256(text.encode()).hexdigest()
+	key = f"lms_lesson_html:{frappe.local.lang}:{text_hash}"
+
+	html = frappe.cache().get_value(key)
+	if html is None:
+		html = markdown_to_html(text, defer_dynamic_macros=True)
+		frappe.cache().set_value(key, html, expires_in_sec=LESSON_HTML_CACHE_TTL)
+
+	return render_deferred_macros(html)
 
 
 def is_mentor(course, email):
@@ -392,7 +825,11 @@ def is_eligible_to_review(course):
 
 
 def get_course_progress(course, member=None):
-	"""Returns the course progress of the session user"""
+	"""Returns the course progress of the session user.
+
+	Recounts the lessons and the completed lessons. Use it to repair the
+	progress counters, as the regular paths derive the progress from them.
+	"""
 	lesson_count = get_lessons(course, get_details=False)
 	if not lesson_count:
 		return 0
@@ -400,8 +837,228 @@ def get_course_progress(course, member=None):
 		"LMS Course Progress",
 		{"course": course, "member": member or frappe.session.user, "status": "Complete"},
 	)
-	precision = cint(frappe.db.get_default("float_precision")) or 3
-	return flt(((completed_lessons / lesson_count) * 100), precision)
+	return flt(((completed_lessons / lesson_count) * 100), get_progress_precision())
+
+
+def get_progress_precision():
+	return cint(frappe.db.get_default("float_precision")) or 3
+
+
+def get_course_lesson_count(course):
+	"""Returns the number of lessons in the course as maintained on the course."""
+	return cint(frappe.db.get_value("LMS Course", course, "lessons")) or count_course_lessons(
+		course
+	)
+
+
+def count_course_lessons(course):
+	ChapterReference = frappe.qb.DocType("Chapter Reference")
+	LessonReference = frappe.qb.DocType("Lesson Reference")
+	return cint(
+		frappe.qb.from_(ChapterReference)
+		.inner_join(LessonReference)
+		.on(LessonReference.parent == ChapterReference.chapter)
+		.select(Count("*"))
+		.where(ChapterReference.parent == course)
+		.run()[0][0]
+	)
+
+
+def update_course_lesson_count(course):
+	"""Updates the lesson count of the course after a change in its structure.
+
+	The progress of all enrollments of the course is updated from their
+	counters if the count has changed.
+	"""
+	lesson_count = count_course_lessons(course)
+	if lesson_count != cint(frappe.db.get_value("LMS Course", course, "lessons")):
+		frappe.db.set_value(
+			"LMS Course", course, "lessons", lesson_count, update_modified=False
+		)
+		clear_catalog_cache()
+		update_enrollment_progress(course, lesson_count)
+
+
+def update_enrollment_progress(course, lesson_count=None):
+	"""Sets the progress of all enrollments of the course from their completed lessons."""
+	if lesson_count is None:
+		lesson_count = get_course_lesson_count(course)
+
+	Enrollment = frappe.qb.DocType("LMS Enrollment")
+	progress = 0
+	if lesson_count:
+		progress = Round(
+			Enrollment.completed_lessons * 100.0 / lesson_count, get_progress_precision()
+		)
+
+	frappe.qb.update(Enrollment).set(Enrollment.progress, progress).where(
+		Enrollment.course == course
+	).run()
+
+
+def increment_completed_lessons(enrollment, course, step=1):
+	"""Atomically adds `step` to the completed lessons of the enrollment and
+	returns its new progress."""
+	lesson_count = get_course_lesson_count(course)
+	Enrollment = frappe.qb.DocType("LMS Enrollment")
+	completed_lessons = Enrollment.completed_lessons + step
+
+	progress = 0
+	if lesson_count:
+		progress = Round(completed_lessons * 100.0 / lesson_count, get_progress_precision())
+
+	# progress is set first as MariaDB evaluates the assignments from left to right
+	(
+		frappe.qb.update(Enrollment)
+		.set(Enrollment.progress, progress)
+		.set(Enrollment.completed_lessons, completed_lessons)
+		.where(Enrollment.name == enrollment)
+		.run()
+	)
+	return flt(frappe.db.get_value("LMS Enrollment", enrollment, "progress"))
+
+
+@frappe.whitelist()
+def recount_course_progress(course):
+	"""Recounts the lessons and the completed lessons of all enrollments of the course."""
+	frappe.only_for("Moderator")
+	recompute_course_progress([course])
+
+
+def recompute_progress(courses=None, chunk_size=1000, workers=1, checkpoint=None):
+	"""Recomputes the lesson counts and the progress of all enrollments of the courses.
+
+	The courses are processed in batches that are committed one at a time. With
+	`workers` > 1 the batches are split across a process pool. If a
+	`checkpoint` file is passed, the courses that are done are recorded in it
+	and skipped when the recompute is run again.
+	"""
+	if courses is None:
+		courses = frappe.get_all("LMS Course", pluck="name", order_by="name")
+
+	done = set()
+	if checkpoint and os.path.exists(checkpoint):
+		with open(checkpoint) as f:
+			done = set(json.load(f))
+
+	def save_checkpoint(batch):
+		done.update(batch)
+		if checkpoint:
+			with open(checkpoint, "w") as f:
+				json.dump(sorted(done), f)
+
+	batches = list(create_batch([course for course in courses if course not in done], 50))
+	if workers > 1 and len(batches) > 1:
+		with ProcessPoolExecutor(
+			max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+		) as pool:
+			futures = {
+				pool.submit(
+					recompute_progress_in_worker, frappe.local.site, batch, chunk_size
+				): batch
+				for batch in batches
+			}
+			for future in as_completed(futures):
+				future.result()
+				save_checkpoint(futures[future])
+	else:
+		for batch in batches:
+			recompute_course_progress(batch, chunk_size)
+			frappe.db.commit()
+			save_checkpoint(batch)
+
+
+def recompute_progress_in_worker(site, courses, chunk_size):
+	frappe.init(site=site)
+	frappe.connect()
+	try:
+		recompute_course_progress(courses, chunk_size)
+		frappe.db.commit()
+	finally:
+		frappe.destroy()
+
+
+def recompute_course_progress(courses, chunk_size=1000):
+	"""Recounts the lessons of the courses and the completed lessons of their
+	enrollments with grouped queries, and writes the changed counters in
+	chunked bulk updates. Returns the number of enrollments updated."""
+	if not courses:
+		return 0
+
+	lesson_counts = get_course_lesson_counts(courses)
+	for course in frappe.get_all(
+		"LMS Course", {"name": ["in", courses]}, ["name", "lessons"]
+	):
+		if cint(course.lessons) != lesson_counts.get(course.name, 0):
+			frappe.db.set_value(
+				"LMS Course",
+				course.name,
+				"lessons",
+				lesson_counts.get(course.name, 0),
+				update_modified=False,
+			)
+			clear_catalog_cache()
+
+	completed_lessons = frappe.get_all(
+		"LMS Course Progress",
+		{"course": ["in", courses], "status": "Complete"},
+		["course", "member", "count(name) as count"],
+		group_by="course, member",
+	)
+	completed_lessons = {(row.course, row.member): row.count for row in completed_lessons}
+
+	precision = get_progress_precision()
+	changes = []
+	for enrollment in frappe.get_all(
+		"LMS Enrollment",
+		{"course": ["in", courses]},
+		["name", "course", "member", "progress", "completed_lessons"],
+	):
+		count = cint(completed_lessons.get((enrollment.course, enrollment.member)))
+		lesson_count = lesson_counts.get(enrollment.course)
+		progress = flt(count * 100 / lesson_count, precision) if lesson_count else 0
+		if count != enrollment.completed_lessons or progress != flt(enrollment.progress):
+			changes.append((enrollment.name, progress, count))
+
+	for chunk in create_batch(changes, chunk_size):
+		update_enrollment_counters(chunk)
+
+	return len(changes)
+
+
+def get_course_lesson_counts(courses):
+	ChapterReference = frappe.qb.DocType("Chapter Reference")
+	LessonReference = frappe.qb.DocType("Lesson Reference")
+	return dict(
+		frappe.qb.from_(ChapterReference)
+		.inner_join(LessonReference)
+		.on(LessonReference.parent == ChapterReference.chapter)
+		.select(ChapterReference.parent, Count("*"))
+		.where(ChapterReference.parent.isin(courses))
+		.groupby(ChapterReference.parent)
+		.run()
+	)
+
+
+def update_enrollment_counters(changes):
+	"""Updates the progress and the completed lessons of the enrollments in one statement.
+
+	`changes` is a list of (enrollment, progress, completed_lessons) tuples.
+	"""
+	Enrollment = frappe.qb.DocType("LMS Enrollment")
+	progress = Case()
+	completed_lessons = Case()
+	for name, enrollment_progress, count in changes:
+		progress = progress.when(Enrollment.name == name, enrollment_progress)
+		completed_lessons = completed_lessons.when(Enrollment.name == name, count)
+
+	(
+		frappe.qb.update(Enrollment)
+		.set(Enrollment.progress, progress)
+		.set(Enrollment.completed_lessons, completed_lessons)
+		.where(Enrollment.name.isin([change[0] for change in changes]))
+		.run()
+	)
 
 
 def get_initial_members(course):
@@ -500,11 +1157,7 @@ def first_lesson_exists(course):
 
 
 def has_course_instructor_role(member=None):
-	return frappe.db.get_value(
-		"Has Role",
-		{"parent": member or frappe.session.user, "role": "Course Creator"},
-		"name",
-	)
+	return has_staff_role(member, "Course Creator")
 
 
 def can_create_courses(course, member=None):
@@ -535,21 +1188,69 @@ def can_create_courses(course, member=None):
 
 
 def has_course_moderator_role(member=None):
-	return frappe.db.get_value(
-		"Has Role",
-		{"parent": member or frappe.session.user, "role": "Moderator"},
-		"name",
-	)
+	return has_staff_role(member, "Moderator")
 
 
 def has_course_evaluator_role(member=None):
-	return frappe.db.get_value(
-		"Has Role",
-		{"parent": member or frappe.session.user, "role": "Batch Evaluator"},
-		"name",
+	return has_staff_role(member, "Batch Evaluator")
+
+
+def has_staff_role(member, role):
+	return role in get_role_directory().roles.get(member or frappe.session.user, [])
+
+
+def get_role_directory():
+	"""Returns the users of each staff role and the staff roles of each user.
+
+	The directory is cached and cleared when roles are assigned or removed.
+	LMS Student is left out, as nearly every user has it.
+	"""
+	return frappe._dict(
+		frappe.cache().get_value(ROLE_DIRECTORY_KEY, generator=build_role_directory)
 	)
 
 
+def build_role_directory():
+	directory = {"users": {role: [] for role in STAFF_ROLES}, "roles": {}}
+	for row in frappe.get_all(
+		"Has Role",
+		{"role": ["in", STAFF_ROLES], "parenttype": "User"},
+		["parent", "role"],
+		order_by="parent",
+	):
+		directory["users"][row.role].append(row.parent)
+		directory["roles"].setdefault(row.parent, []).append(row.role)
+	return directory
+
+
+def clear_role_directory(doc=None, method=None):
+	"""Clears the cached role directory once the transaction is committed."""
+	frappe.db.after_commit.add(lambda: frappe.cache().delete_value(ROLE_DIRECTORY_KEY))
+
+
+def get_role_users(role):
+	"""Returns the users that have the staff `role`."""
+	return list(get_role_directory().users.get(role, []))
+
+
+def get_lms_roles(users):
+	"""Returns a map of each user to their LMS roles, for a page of users.
+
+	Staff roles come from the role directory and LMS Student is loaded for all
+	users with one query.
+	"""
+	directory = get_role_directory()
+	roles = {user: list(directory.roles.get(user, [])) for user in users}
+	if users:
+		for user in frappe.get_all(
+			"Has Role",
+			{"role": "LMS Student", "parent": ["in", users], "parenttype": "User"},
+			pluck="parent",
+		):
+			roles[user].append("LMS Student")
+	return roles
+
+
 def has_student_role(member=None):
 	return frappe.db.get_value(
 		"Has Role",
@@ -622,8 +1323,7 @@ def create_notification_log(doc, topic):
 		batch_title = frappe.db.get_value("LMS Batch", topic.reference_docname, "title")
 		subject = _("New comment in batch {0}").format(batch_title)
 		link = f"/batches/{topic.reference_docname}"
-		moderators = frappe.get_all("Has Role", {"role": "Moderator"}, pluck="parent")
-		users += moderators
+		users += get_role_users("Moderator")
 
 	notification = frappe._dict(
 		{
@@ -786,25 +1486,14 @@ def get_chart_data(
 		from_date = add_months(getdate(), -1)
 	if not to_date:
 		to_date = getdate()
-	chart = frappe.get_doc("Dashboard Chart", chart_name)
-	filters = [([chart.document_type, "docstatus", "<", 2, False])]
-	doctype = chart.document_type
-	datefield = chart.based_on
-	value_field = chart.value_based_on or "1"
+	chart = frappe.get_cached_doc("Dashboard Chart", chart_name)
 	from_date = get_datetime(from_date).strftime("%Y-%m-%d")
 	to_date = get_datetime(to_date)
 
-	filters.append([doctype, datefield, ">=", from_date, False])
-	filters.append([doctype, datefield, "<=", to_date, False])
-
-	data = frappe.db.get_all(
-		doctype,
-		fields=[f"{datefield} as _unit", f"SUM({value_field})", "COUNT(*)"],
-		filters=filters,
-		group_by="_unit",
-		order_by="_unit asc",
-		as_list=True,
-	)
+	if chart.module == "LMS":
+		data = get_rolled_up_chart_data(chart, from_date, to_date)
+	else:
+		data = get_daily_chart_data(chart, from_date, add_days(getdate(to_date), 1))
 
 	result = get_result(data, timegrain, from_date, to_date, chart.chart_type)
 
@@ -819,10 +1508,42 @@ def get_chart_data(
 	}
 
 
+def get_rolled_up_chart_data(chart, from_date, to_date):
+	"""Returns the daily (date, sum, count) rows of the chart from its rollups.
+
+	Days up to the last rolled up day are read from the rollups, and every day
+	after it is counted live, so days the scheduled job has not reached yet are
+	not left out. Until the chart is rolled up, the requested range is counted
+	live. Nothing is written from the request.
+	"""
+	to_date = getdate(to_date)
+	last_date = frappe.db.get_value(
+		"LMS Chart Rollup", {"chart": chart.name}, "max(date)"
+	)
+	if not last_date:
+		return get_daily_chart_data(chart, from_date, add_days(to_date, 1))
+
+	last_date = getdate(last_date)
+	data = frappe.get_all(
+		"LMS Chart Rollup",
+		{"chart": chart.name, "date": ["between", [from_date, min(last_date, to_date)]]},
+		["date", "value", "document_count"],
+		order_by="date asc",
+		as_list=True,
+	)
+
+	live_from = max(add_days(last_date, 1), getdate(from_date))
+	if live_from <= to_date:
+		data += get_daily_chart_data(chart, live_from, add_days(to_date, 1))
+
+	return data
+
+
 @frappe.whitelist(allow_guest=True)
 def get_course_completion_data():
-	all_membership = frappe.db.count("LMS Enrollment")
-	completed = frappe.db.count("LMS Enrollment", {"progress": ["like", "%100%"]})
+	counters = get_platform_counters()
+	all_membership = counters.enrollments
+	completed = counters.completions
 
 	return {
 		"labels": ["Completed", "In Progress"],
@@ -835,6 +1556,35 @@ def get_course_completion_data():
 	}
 
 
+def get_platform_counters():
+	"""Returns the platform wide counts shown on the statistics pages.
+
+	The counts are kept in the cache and refreshed by `reconcile_platform_counters`.
+	"""
+	counters = frappe.cache().get_value(PLATFORM_COUNTERS_KEY)
+	if counters is None:
+		counters = reconcile_platform_counters()
+	return frappe._dict(counters)
+
+
+def reconcile_platform_counters():
+	"""Counts the enrollments, completions, published courses, enabled users and
+	lesson completions and stores them in the cache."""
+	counters = {
+		"enrollments": frappe.db.count("LMS Enrollment"),
+		"completions": frappe.db.count("LMS Enrollment", {"progress": [">=", 100]}),
+		"courses": frappe.db.count("LMS Course", {"published": 1, "upcoming": 0}),
+		"users": frappe.db.count(
+			"User", {"enabled": 1, "name": ["not in", ("Administrator", "Guest")]}
+		),
+		"lesson_completions": frappe.db.count("LMS Course Progress"),
+	}
+	frappe.cache().set_value(
+		PLATFORM_COUNTERS_KEY, counters, expires_in_sec=PLATFORM_COUNTERS_TTL
+	)
+	return counters
+
+
 def get_telemetry_boot_info():
 	POSTHOG_PROJECT_FIELD = "posthog_project_id"
 	POSTHOG_HOST_FIELD = "posthog_host"
@@ -1004,52 +1754,343 @@ def change_currency(amount, currency, country=None):
 	return fmt_money(amount, 0, currency)
 
 
+COURSE_FIELDS = [
+	"name",
+	"title",
+	"tags",
+	"description",
+	"image",
+	"video_link",
+	"short_introduction",
+	"published",
+	"upcoming",
+	"featured",
+	"disable_self_learning",
+	"published_on",
+	"category",
+	"status",
+	"paid_course",
+	"course_price",
+	"currency",
+	"amount_usd",
+	"enable_certification",
+	"lessons",
+	"enrollments",
+	"rating",
+]
+
+MEMBERSHIP_FIELDS = ["name", "course", "current_lesson", "progress", "member"]
+
+CATALOG_SORT_FIELDS = ["enrollments", "rating", "published_on"]
+CATALOG_STATUSES = ["live", "new", "upcoming", "under_review", "enrolled", "created"]
+
+
 @frappe.whitelist(allow_guest=True)
 def get_courses():
-	"""Returns the list of courses."""
-	courses = []
-	course_list = frappe.get_all("LMS Course", pluck="name")
-	for course in course_list:
-		courses.append(get_course_details(course))
+	"""Returns the list of courses.
+
+	The catalog is shared by all users and served from the cache. Only the
+	memberships of the session user are fetched per request.
+	"""
+	courses = get_catalog_cache("lms_course_catalog", get_course_catalog)
+	memberships = get_memberships_for_courses([course.name for course in courses])
+
+	for course in courses:
+		set_membership_details(course, memberships.get(course.name))
 
 	courses = get_categorized_courses(courses)
 	return courses
 
 
 @frappe.whitelist(allow_guest=True)
-def get_course_details(course):
-	course_details = frappe.db.get_value(
-		"LMS Course",
-		course,
-		[
-			"name",
-			"title",
-			"tags",
-			"description",
-			"image",
-			"video_link",
-			"short_introduction",
-			"published",
-			"upcoming",
-			"featured",
-			"disable_self_learning",
-			"published_on",
-			"category",
-			"status",
-			"paid_course",
-			"course_price",
-			"currency",
-			"amount_usd",
-			"enable_certification",
-			"lessons",
-			"enrollments",
-			"rating",
-		],
-		as_dict=1,
+def get_course_list(
+	category=None,
+	tag=None,
+	paid=None,
+	status=None,
+	search=None,
+	sort_by="enrollments",
+	cursor=None,
+	page_length=20,
+):
+	"""Returns a page of courses, filtered and sorted on the server.
+
+	`status` is one of the tabs of the catalog (live, new, upcoming,
+	under_review, enrolled, created). Courses are sorted in descending order
+	of `sort_by`. The returned `cursor` is passed back to fetch the next page
+	and is None on the last page.
+	"""
+	if sort_by not in CATALOG_SORT_FIELDS:
+		frappe.throw(_("Courses cannot be sorted by {0}").format(sort_by))
+	if status and status not in CATALOG_STATUSES:
+		frappe.throw(_("Invalid status {0}").format(status))
+
+	page_length = min(cint(page_length) or 20, 100)
+	Course = frappe.qb.DocType("LMS Course")
+
+	def sort_key():
+		if sort_by == "published_on":
+			return IfNull(Course.published_on, "1900-01-01")
+		return IfNull(Cast(Course[sort_by], "DECIMAL(21,9)"), 0)
+
+	query = (
+		frappe.qb.from_(Course)
+		.select(*[Course[field] for field in COURSE_FIELDS], sort_key().as_("sort_key"))
+		.where(get_visible_courses_condition(Course))
+		.orderby(sort_key(), order=frappe.qb.desc)
+		.orderby(Course.name, order=frappe.qb.desc)
+		.limit(page_length + 1)
 	)
+
+	if category:
+		query = query.where(Course.category == category)
+
+	if paid not in (None, ""):
+		query = query.where(Course.paid_course == cint(paid))
+
+	if tag:
+		pattern = escape_like(tag)
+		query = query.where(
+			(Course.tags == tag)
+			| Course.tags.like(f"{pattern},%")
+			| Course.tags.like(f"%,{pattern},%")
+			| Course.tags.like(f"%,{pattern}")
+		)
+
+	if search:
+		pattern = f"%{escape_like(search)}%"
+		query = query.where(
+			Course.title.like(pattern)
+			| Course.short_introduction.like(pattern)
+			| Course.tags.like(pattern)
+		)
+
+	if status:
+		query = filter_courses_by_status(query, Course, status)
+
+	if cursor:
+		value, name = decode_catalog_cursor(cursor)
+		query = query.where(
+			(sort_key() < value) | ((sort_key() == value) & (Course.name < name))
+		)
+
+	courses = query.run(as_dict=1)
+	next_cursor = None
+	if len(courses) > page_length:
+		courses = courses[:page_length]
+		next_cursor = encode_catalog_cursor(courses[-1].sort_key, courses[-1].name)
+
+	course_names = [course.name for course in courses]
+	instructors = get_instructors_for_courses(course_names)
+	memberships = get_memberships_for_courses(course_names)
+
+	for course in courses:
+		course.pop("sort_key")
+		format_course_details(course, instructors.get(course.name, []))
+		set_membership_details(course, memberships.get(course.name))
+
+	return {"courses": courses, "cursor": next_cursor}
+
+
+def escape_like(value):
+	"""Escapes the wildcards of a LIKE pattern, so that `value` is matched literally."""
+	return cstr(value).replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def get_instructed_courses_query(member=None):
+	CourseInstructor = frappe.qb.DocType("Course Instructor")
+	return (
+		frappe.qb.from_(CourseInstructor)
+		.select(CourseInstructor.parent)
+		.where(CourseInstructor.instructor == (member or frappe.session.user))
+	)
+
+
+def get_enrolled_courses_query(member=None):
+	Enrollment = frappe.qb.DocType("LMS Enrollment")
+	return (
+		frappe.qb.from_(Enrollment)
+		.select(Enrollment.course)
+		.where(Enrollment.member == (member or frappe.session.user))
+	)
+
+
+def get_visible_courses_condition(Course):
+	"""Returns the condition for the courses the session user can see in the catalog.
+
+	Guests see published courses and courses under review. Logged in users
+	also see the drafts they created or teach and the courses they are
+	enrolled in.
+	"""
+	condition = (Course.published == 1) | (Course.status == "Under Review")
+	if frappe.session.user == "Guest":
+		return condition
+
+	return (
+		condition
+		| (Course.owner == frappe.session.user)
+		| Course.name.isin(get_instructed_courses_query())
+		| Course.name.isin(get_enrolled_courses_query())
+	)
+
+
+def filter_courses_by_status(query, Course, status):
+	if status == "under_review":
+		return query.where(Course.status == "Under Review")
+
+	if status == "upcoming":
+		return query.where(
+			(Course.published == 1)
+			& (Course.upcoming == 1)
+			& (Course.status != "Under Review")
+		)
+
+	if status == "live":
+		return query.where(
+			(Course.published == 1)
+			& (Course.upcoming == 0)
+			& (Course.status != "Under Review")
+		)
+
+	if status == "new":
+		return query.where(
+			(Course.published == 1)
+			& (Course.upcoming == 0)
+			& (Course.published_on > add_months(getdate(), -3))
+		)
+
+	if status == "enrolled":
+		return query.where(Course.name.isin(get_enrolled_courses_query()))
+
+	# created courses that the user is enrolled in are listed as enrolled
+	return query.where(
+		Course.name.isin(get_instructed_courses_query())
+		& Course.name.notin(get_enrolled_courses_query())
+	)
+
+
+def encode_catalog_cursor(value, name):
+	cursor = json.dumps([cstr(value), name])
+	return base64.urlsafe_b64encode(cursor.encode()).decode()
+
+
+def decode_catalog_cursor(cursor):
+	try:
+		value, name = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+	except (ValueError, TypeError):
+		frappe.throw(_("Invalid cursor"))
+	return value, name
+
+
+def get_course_catalog():
+	"""Returns the details of all courses that do not depend on the session user.
+
+	Courses and instructors are loaded with one query each, so the number of
+	queries does not grow with the size of the catalog.
+	"""
+	courses = frappe.get_all("LMS Course", fields=COURSE_FIELDS)
+	instructors = get_instructors_for_courses([course.name for course in courses])
+
+	for course in courses:
+		format_course_details(course, instructors.get(course.name, []))
+
+	return courses
+
+
+def get_catalog_cache(key, generator):
+	"""Returns a copy of the shared catalog payload cached under `key`."""
+	return get_versioned_cache(
+		key, CATALOG_CACHE_VERSION_KEY, generator, expires_in_sec=CATALOG_CACHE_TTL
+	)
+
+
+def clear_catalog_cache(doc=None, method=None):
+	"""Invalidates the cached course and batch catalog once the transaction is committed."""
+	clear_cache_version(CATALOG_CACHE_VERSION_KEY)
+
+
+def get_versioned_cache(
+	key, version_key, generator, expires_in_sec=None, deep_copy=True
+):
+	"""Returns a copy of the value cached under `key` for the current version.
+
+	The value is built with `generator` when it is missing or when the
+	version stored under `version_key` has changed since it was cached.
+	Pass `deep_copy=False` for values that the caller only reads.
+	"""
+	cache_key = f"{key}:{get_cache_version(version_key)}"
+	value = frappe.cache().get_value(cache_key)
+	if value is None:
+		value = generator()
+		frappe.cache().set_value(cache_key, value, expires_in_sec=expires_in_sec)
+
+	return copy.deepcopy(value) if deep_copy else value
+
+
+def get_cache_version(version_key):
+	version = frappe.cache().get_value(version_key)
+	if not version:
+		version = frappe.generate_hash(length=10)
+		frappe.cache().set_value(version_key, version)
+	return version
+
+
+def clear_cache_version(version_key):
+	"""Drops the version stamp once the transaction is committed, so that readers
+	do not cache data from before the change under the new version."""
+	frappe.db.after_commit.add(lambda: frappe.cache().delete_value(version_key))
+
+
+def get_course_structure_version_key(course):
+	return f"lms_course_structure_version:{course}"
+
+
+def clear_course_structure_cache(course):
+	"""Invalidates the cached outline and lesson index of the course."""
+	if course:
+		clear_cache_version(get_course_structure_version_key(course))
+
+
+def on_course_structure_change(doc, method=None):
+	"""Invalidates the cached structure of the course that the document belongs to."""
+	if doc.doctype == "LMS Course":
+		course = doc.name
+	elif doc.doctype == "Chapter Reference":
+		course = doc.parent
+	elif doc.doctype == "Lesson Reference":
+		course = frappe.db.get_value("Course Chapter", doc.parent, "course")
+	else:
+		course = doc.course
+
+	if course:
+		clear_course_structure_cache(course)
+		update_course_lesson_count(course)
+
+
+@frappe.whitelist(allow_guest=True)
+def get_course_details(course):
+	course_details = frappe.db.get_value("LMS Course", course, COURSE_FIELDS, as_dict=1)
+	format_course_details(course_details, get_instructors(course_details.name))
+
+	membership = None
+	if frappe.session.user != "Guest":
+		membership = frappe.db.get_value(
+			"LMS Enrollment",
+			{"member": frappe.session.user, "course": course_details.name},
+			MEMBERSHIP_FIELDS,
+			as_dict=1,
+		)
+		merge_buffered_current_lesson(membership, course_details.name)
+
+	set_membership_details(course_details, membership)
+	return course_details
+
+
+def format_course_details(course_details, instructors):
+	"""Sets the fields of the course payload that do not depend on the session user."""
 	course_details.tags = course_details.tags.split(",") if course_details.tags else []
+	course_details.instructors = instructors
 
-	course_details.instructors = get_instructors(course_details.name)
 	if course_details.paid_course:
 		"""course_details.course_price, course_details.currency = check_multicurrency(
 		        course_details.course_price, course_details.currency, None, course_details.amount_usd
@@ -1058,26 +2099,115 @@ def get_course_details(course):
 			course_details.course_price, 0, course_details.currency
 		)
 
+	return course_details
+
+
+def set_membership_details(course_details, membership):
+	"""Sets the fields of the course payload that depend on the session user."""
 	if frappe.session.user == "Guest":
 		course_details.membership = None
 		course_details.is_instructor = False
 	else:
-		course_details.membership = frappe.db.get_value(
-			"LMS Enrollment",
-			{"member": frappe.session.user, "course": course_details.name},
-			["name", "course", "current_lesson", "progress", "member"],
-			as_dict=1,
+		course_details.membership = membership
+		course_details.is_instructor = any(
+			instructor.name == frappe.session.user for instructor in course_details.instructors
 		)
-		course_details.is_instructor = is_instructor(course_details.name)
 
 	if course_details.membership and course_details.membership.current_lesson:
-		course_details.current_lesson = get_lesson_index(
-			course_details.membership.current_lesson
-		)
+		course_details.current_lesson = course_details.membership.pop(
+			"current_lesson_index", None
+		) or get_lesson_index(course_details.membership.current_lesson)
 
 	return course_details
 
 
+def get_instructors_for_courses(courses):
+	"""Returns a map of course to its instructors, fetched in a single query."""
+	instructors = frappe._dict()
+	if not courses:
+		return instructors
+
+	CourseInstructor = frappe.qb.DocType("Course Instructor")
+	User = frappe.qb.DocType("User")
+	rows = (
+		frappe.qb.from_(CourseInstructor)
+		.inner_join(User)
+		.on(CourseInstructor.instructor == User.name)
+		.select(
+			CourseInstructor.parent,
+			User.name,
+			User.username,
+			User.full_name,
+			User.user_image,
+			User.first_name,
+		)
+		.where(CourseInstructor.parent.isin(courses))
+		.orderby(CourseInstructor.idx)
+		.run(as_dict=1)
+	)
+
+	for row in rows:
+		course = row.pop("parent")
+		instructors.setdefault(course, []).append(row)
+
+	return instructors
+
+
+def get_memberships_for_courses(courses, member=None):
+	"""Returns a map of course to the enrollment of the member, fetched in a single query.
+
+	The lesson index of the current lesson is resolved in bulk as well and set
+	as `current_lesson_index` on each membership.
+	"""
+	if not member:
+		member = frappe.session.user
+
+	memberships = frappe._dict()
+	if member == "Guest" or not courses:
+		return memberships
+
+	rows = frappe.get_all(
+		"LMS Enrollment",
+		{"member": member, "course": ["in", courses]},
+		MEMBERSHIP_FIELDS,
+	)
+	buffered_lessons = get_buffered_current_lessons([row.course for row in rows], member)
+	for row in rows:
+		row.current_lesson = buffered_lessons.get(row.course) or row.current_lesson
+	lesson_indexes = get_lesson_indexes([row.current_lesson for row in rows])
+
+	for row in rows:
+		if row.current_lesson:
+			row.current_lesson_index = lesson_indexes.get(row.current_lesson, "1-1")
+		memberships[row.course] = row
+
+	return memberships
+
+
+def get_lesson_indexes(lessons):
+	"""Returns a map of lesson to its {chapter_index}-{lesson_index}, fetched in a single query."""
+	lessons = list({lesson for lesson in lessons if lesson})
+	if not lessons:
+		return {}
+
+	LessonReference = frappe.qb.DocType("Lesson Reference")
+	ChapterReference = frappe.qb.DocType("Chapter Reference")
+	rows = (
+		frappe.qb.from_(LessonReference)
+		.inner_join(ChapterReference)
+		.on(ChapterReference.chapter == LessonReference.parent)
+		.select(
+			LessonReference.lesson,
+			ChapterReference.idx.as_("chapter_idx"),
+			LessonReference.idx.as_("lesson_idx"),
+		)
+		.where(LessonReference.lesson.isin(lessons))
+		.run(as_dict=1)
+	)
+
+	return {row.lesson: f"{row.chapter_idx}-{row.lesson_idx}" for row in rows}
+
+
 def get_categorized_courses(courses):
 	live, upcoming, new, enrolled, created, under_review = [], [], [], [], [], []
 
@@ -1119,41 +2249,80 @@ def get_categorized_courses(courses):
 
 @frappe.whitelist(allow_guest=True)
 def get_course_outline(course, progress=False):
-	"""Returns the course outline."""
-	outline = []
-	chapters = frappe.get_all(
-		"Chapter Reference", {"parent": course}, ["chapter", "idx"], order_by="idx"
+	"""Returns the course outline.
+
+	The outline is cached until the structure of the course changes. The
+	progress of the session user is set on top of it with a single query.
+	"""
+	outline = get_versioned_cache(
+		f"lms_course_outline:{course}",
+		get_course_structure_version_key(course),
+		lambda: build_course_outline(course),
+		expires_in_sec=COURSE_STRUCTURE_CACHE_TTL,
 	)
-	for chapter in chapters:
-		chapter_details = frappe.db.get_value(
-			"Course Chapter",
-			chapter.chapter,
-			["name", "title", "is_scorm_package", "launch_file", "scorm_package"],
-			as_dict=True,
+
+	if progress:
+		lessons = [lesson for chapter in outline for lesson in chapter.lessons]
+		set_lesson_progress(lessons, course)
+
+	return outline
+
+
+def build_course_outline(course):
+	"""Returns the course outline without the progress of the session user."""
+	ChapterReference = frappe.qb.DocType("Chapter Reference")
+	Chapter = frappe.qb.DocType("Course Chapter")
+	outline = (
+		frappe.qb.from_(ChapterReference)
+		.inner_join(Chapter)
+		.on(Chapter.name == ChapterReference.chapter)
+		.select(
+			Chapter.name,
+			Chapter.title,
+			Chapter.is_scorm_package,
+			Chapter.launch_file,
+			Chapter.scorm_package,
+			ChapterReference.idx,
 		)
-		chapter_details["idx"] = chapter.idx
-		chapter_details.lessons = get_lessons(course, chapter_details, progress=progress)
+		.where(ChapterReference.parent == course)
+		.orderby(ChapterReference.idx)
+		.run(as_dict=1)
+	)
 
-		if chapter_details.is_scorm_package:
-			chapter_details.scorm_package = frappe.db.get_value(
+	chapter_lessons = get_chapter_lessons(outline)
+	scorm_packages = [
+		chapter.scorm_package for chapter in outline if chapter.is_scorm_package
+	]
+	scorm_files = {}
+	if scorm_packages:
+		scorm_files = {
+			file.name: file
+			for file in frappe.get_all(
 				"File",
-				chapter_details.scorm_package,
-				["file_name", "file_size", "file_url"],
-				as_dict=1,
+				{"name": ["in", scorm_packages]},
+				["name", "file_name", "file_size", "file_url"],
 			)
+		}
+
+	for chapter in outline:
+		chapter.lessons = chapter_lessons.get(chapter.name, [])
+
+		if chapter.is_scorm_package:
+			package = scorm_files.get(chapter.scorm_package)
+			if package:
+				package = frappe._dict(package)
+				package.pop("name")
+			chapter.scorm_package = package
 
-		outline.append(chapter_details)
 	return outline
 
 
 @frappe.whitelist(allow_guest=True)
 def get_lesson(course, chapter, lesson):
-	chapter_name = frappe.db.get_value(
-		"Chapter Reference", {"parent": course, "idx": chapter}, "chapter"
-	)
-	lesson_name = frappe.db.get_value(
-		"Lesson Reference", {"parent": chapter_name, "idx": lesson}, "lesson"
+	entry = get_course_lesson_index(course).by_number.get(
+		get_lesson_number(chapter, lesson)
 	)
+	lesson_name = entry.lesson if entry else None
 	lesson_details = frappe.db.get_value(
 		"Course Lesson",
 		lesson_name,
@@ -1200,10 +2369,9 @@ def get_lesson(course, chapter, lesson):
 		progress = get_progress(course, lesson_details.name)
 
 	lesson_details.rendered_content = render_html(lesson_details)
-	neighbours = get_neighbour_lesson(course, chapter, lesson)
-	lesson_details.next = neighbours["next"]
+	lesson_details.next = entry.next
 	lesson_details.progress = progress
-	lesson_details.prev = neighbours["prev"]
+	lesson_details.prev = entry.prev
 	lesson_details.membership = membership
 	lesson_details.instructors = get_instructors(course)
 	lesson_details.course_title = course_title
@@ -1211,42 +2379,46 @@ def get_lesson(course, chapter, lesson):
 
 
 def get_neighbour_lesson(course, chapter, lesson):
-	numbers = []
-	current = f"{chapter}.{lesson}"
-	chapters = frappe.get_all("Chapter Reference", {"parent": course}, ["idx", "chapter"])
-	for chapter in chapters:
-		lessons = frappe.get_all("Lesson Reference", {"parent": chapter.chapter}, pluck="idx")
-		for lesson in lessons:
-			numbers.append(f"{chapter.idx}.{lesson}")
-
-	tuples_list = [tuple(int(x) for x in s.split(".")) for s in numbers]
-	sorted_tuples = sorted(tuples_list)
-	sorted_numbers = [".".join(str(num) for num in t) for t in sorted_tuples]
-	index = sorted_numbers.index(current)
-
+	entry = get_course_lesson_index(course).by_number.get(
+		get_lesson_number(chapter, lesson)
+	)
 	return {
-		"prev": sorted_numbers[index - 1] if index - 1 >= 0 else None,
-		"next": sorted_numbers[index + 1] if index + 1 < len(sorted_numbers) else None,
+		"prev": entry.prev if entry else None,
+		"next": entry.next if entry else None,
 	}
 
 
 @frappe.whitelist(allow_guest=True)
 def get_batches():
-	batches = []
-	filters = {}
 	if frappe.session.user == "Guest":
-		filters.update({"start_date": [">=", getdate()], "published": 1})
-	batch_list = frappe.get_all("LMS Batch", filters)
+		batches = get_catalog_cache(
+			f"lms_guest_batches:{getdate()}",
+			lambda: get_batch_catalog({"start_date": [">=", getdate()], "published": 1}),
+		)
+	else:
+		batches = get_catalog_cache("lms_batches", get_batch_catalog)
 
-	for batch in batch_list:
-		batches.append(get_batch_details(batch.name))
+	for batch in batches:
+		set_batch_price(batch)
 
 	batches = categorize_batches(batches)
 	return batches
 
 
+def get_batch_catalog(filters=None):
+	"""Returns the details of the batches that do not depend on the session user."""
+	batch_list = frappe.get_all("LMS Batch", filters or {})
+	return [build_batch_details(batch.name) for batch in batch_list]
+
+
 @frappe.whitelist(allow_guest=True)
 def get_batch_details(batch):
+	batch_details = build_batch_details(batch)
+	set_batch_price(batch_details)
+	return batch_details
+
+
+def build_batch_details(batch):
 	batch_details = frappe.db.get_value(
 		"LMS Batch",
 		batch,
@@ -1282,20 +2454,31 @@ def get_batch_details(batch):
 	batch_details.students = frappe.get_all(
 		"Batch Student", {"parent": batch}, pluck="student"
 	)
+
+	if batch_details.seat_count:
+		batch_details.seats_left = batch_details.seat_count - len(batch_details.students)
+
+	return batch_details
+
+
+def set_batch_price(batch_details):
+	"""Sets the price of the batch in the currency of the session user."""
 	if batch_details.paid_batch and batch_details.start_date >= getdate():
 		batch_details.amount, batch_details.currency = check_multicurrency(
 			batch_details.amount, batch_details.currency, None, batch_details.amount_usd
 		)
 		batch_details.price = fmt_money(batch_details.amount, 0, batch_details.currency)
 
-	if batch_details.seat_count:
-		batch_details.seats_left = batch_details.seat_count - len(batch_details.students)
-
 	return batch_details
 
 
 def categorize_batches(batches):
 	upcoming, archived, private, enrolled = [], [], [], []
+	enrolled_batches = set()
+	if frappe.session.user != "Guest":
+		enrolled_batches = set(
+			frappe.get_all("Batch Student", {"student": frappe.session.user}, pluck="parent")
+		)
 
 	for batch in batches:
 		if not batch.published:
@@ -1309,11 +2492,8 @@ def categorize_batches(batches):
 		else:
 			upcoming.append(batch)
 
-		if frappe.session.user != "Guest":
-			if frappe.db.exists(
-				"Batch Student", {"student": frappe.session.user, "parent": batch.name}
-			):
-				enrolled.append(batch)
+		if batch.name in enrolled_batches:
+			enrolled.append(batch)
 
 	categories = [archived, private, enrolled]
 	for category in categories:
@@ -1608,12 +2788,10 @@ def get_order_summary(doctype, docname, country=None):
 
 @frappe.whitelist()
 def get_lesson_creation_details(course, chapter, lesson):
-	chapter_name = frappe.db.get_value(
-		"Chapter Reference", {"parent": course, "idx": chapter}, "chapter"
-	)
-	lesson_name = frappe.db.get_value(
-		"Lesson Reference", {"parent": chapter_name, "idx": lesson}, "lesson"
-	)
+	index = get_course_lesson_index(course)
+	chapter_name = index.chapters.get(cint(chapter))
+	entry = index.by_number.get(get_lesson_number(chapter, lesson))
+	lesson_name = entry.lesson if entry else None
 
 	if lesson_name:
 		lesson_details = frappe.db.get_value(
@@ -1766,15 +2944,42 @@ def get_programs():
 			"LMS Program Member", {"member": frappe.session.user}, ["parent as name", "progress"]
 		)
 
+	program_names = [program.name for program in programs]
+	if not program_names:
+		return programs
+
+	program_courses = frappe.get_all(
+		"LMS Program Course",
+		{"parent": ["in", program_names]},
+		["parent", "course"],
+		order_by="parent, idx",
+	)
+	catalog = {
+		course.name: course
+		for course in get_catalog_cache("lms_course_catalog", get_course_catalog)
+	}
+	memberships = get_memberships_for_courses(
+		list({course.course for course in program_courses})
+	)
+	members = frappe.get_all(
+		"LMS Program Member",
+		{"parent": ["in", program_names]},
+		["parent", "count(name) as count"],
+		group_by="parent",
+	)
+	members = {row.parent: row.count for row in members}
+
 	for program in programs:
-		program_courses = frappe.get_all(
-			"LMS Program Course", {"parent": program.name}, ["course"], order_by="idx"
-		)
 		program.courses = []
 		previous_progress = 0
-		for i, course in enumerate(program_courses):
-			details = get_course_details(course.course)
-			if i == 0:
+		for course in program_courses:
+			if course.parent != program.name or course.course not in catalog:
+				continue
+
+			details = frappe._dict(catalog[course.course])
+			membership = memberships.get(course.course)
+			set_membership_details(details, membership and frappe._dict(membership))
+			if not program.courses:
 				details.eligible = True
 			elif previous_progress == 100:
 				details.eligible = True
@@ -1784,7 +2989,7 @@ def get_programs():
 			previous_progress = details.membership.progress if details.membership else 0
 			program.courses.append(details)
 
-		program.members = frappe.db.count("LMS Program Member", {"parent": program.name})
+		program.members = members.get(program.name, 0)
 
 	return programs
 
@@ -1799,6 +3004,7 @@ def enroll_in_program_course(program, course):
 		enrollment = frappe.db.get_value(
 			"LMS Enrollment", enrollment, ["name", "current_lesson"], as_dict=1
 		)
+		merge_buffered_current_lesson(enrollment, course, frappe.session.user)
 		enrollment.current_lesson = get_lesson_index(enrollment.current_lesson)
 		return enrollment
 
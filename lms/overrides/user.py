@@ -1,14 +1,22 @@
 import hashlib
+import re
 import frappe
 import requests
 from frappe import _
 from frappe.core.doctype.user.user import User
-from frappe.utils import cint, escape_html, random_string
+from frappe.utils import cint, cstr, escape_html, flt, random_string
 from frappe.website.utils import is_signup_disabled
-from lms.lms.utils import get_average_rating, get_country_code
+from lms.lms.utils import clear_role_directory, escape_like, get_country_code
 from frappe.website.utils import cleanup_page_name
 from frappe.model.naming import append_number_if_name_exists
 from lms.widgets import Widgets
+from lms.lms.doctype.lms_member_search_index.lms_member_search_index import (
+	delete_member_search_index,
+	update_member_search_index,
+)
+
+# innodb_ft_min_token_size, words shorter than this are not in the full-text index
+MIN_FULLTEXT_TOKEN_SIZE = 3
 
 
 class CustomUser(User):
@@ -20,6 +28,16 @@ class CustomUser(User):
 		super().after_insert()
 		self.add_roles("LMS Student")
 
+	def on_update(self):
+		super().on_update()
+		update_member_search_index(self)
+		clear_role_directory()
+
+	def on_trash(self):
+		super().on_trash()
+		delete_member_search_index(self)
+		clear_role_directory()
+
 	def validate_username_duplicates(self):
 		while not self.username or self.username_exists():
 			self.username = append_number_if_name_exists(
@@ -96,6 +114,7 @@ def get_enrolled_courses():
 				"currency",
 				"published",
 				"creation",
+				"rating",
 			],
 			as_dict=True,
 		)
@@ -104,7 +123,7 @@ def get_enrolled_courses():
 		course.enrollment_count = frappe.db.count(
 			"LMS Enrollment", {"course": course.name, "member_type": "Student"}
 		)
-		course.avg_rating = get_average_rating(course.name) or 0
+		course.avg_rating = flt(course.rating)
 		progress = cint(membership.progress)
 		if progress < 100:
 			in_progress.append(course)
@@ -150,6 +169,7 @@ def get_authored_courses(member=None, only_published=True):
 				"status",
 				"published",
 				"creation",
+				"rating",
 			],
 			as_dict=True,
 		)
@@ -159,7 +179,7 @@ def get_authored_courses(member=None, only_published=True):
 		detail.enrollment_count = frappe.db.count(
 			"LMS Enrollment", {"course": detail.name, "member_type": "Student"}
 		)
-		detail.avg_rating = get_average_rating(detail.name) or 0
+		detail.avg_rating = flt(detail.rating)
 		course_details.append(detail)
 
 	course_details.sort(key=lambda x: x.enrollment_count, reverse=True)
@@ -259,85 +279,79 @@ def on_session_creation(login_manager):
 
 @frappe.whitelist()
 def search_users(start: int = 0, text: str = ""):
-	start = cint(start)
-	search_text = frappe.db.escape(f"%{text}%")
+	"""Searches the member index and returns a page of members, best matches first.
 
-	or_filters = get_or_filters(search_text)
-	count = len(get_users(or_filters, 0, 900000000))
-	users = get_users(or_filters, start, 24)
+	Every word of `text` must match the start of a word in the profile. Words
+	shorter than the full-text index's minimum token size are matched as
+	substrings instead.
+	"""
+	start = cint(start)
+	condition, values, rank = get_search_condition(text)
+
+	count = frappe.db.sql(
+		f"""
+		SELECT COUNT(*)
+		FROM `tabLMS Member Search Index`
+		WHERE enabled = 1 {condition}
+	""",
+		values,
+	)[0][0]
+	users = get_users(condition, values, rank, start, 24)
 	user_details = get_user_details(users)
 
 	return {"user_details": user_details, "start": start + 24, "count": count}
 
 
-def get_or_filters(text):
-	user_fields = [
-		"first_name",
-		"last_name",
-		"full_name",
-		"email",
-		"preferred_location",
-		"dream_companies",
-	]
-	education_fields = ["institution_name", "location", "degree_type", "major"]
-	work_fields = ["title", "company"]
-	certification_fields = ["certification_name", "organization"]
-
-	or_filters = []
-	if text:
-		for field in user_fields:
-			or_filters.append(f"u.{field} like {text}")
-		for field in education_fields:
-			or_filters.append(f"ed.{field} like {text}")
-		for field in work_fields:
-			or_filters.append(f"we.{field} like {text}")
-		for field in certification_fields:
-			or_filters.append(f"c.{field} like {text}")
+def get_search_condition(text):
+	"""Returns the condition on the member index for `text`, its values and the
+	expression to rank the matches by."""
+	words = re.findall(r"\w+", cstr(text).lower())
+	if not words:
+		return "", {}, None
 
-		or_filters.append(f"s.skill_name like {text}")
-		or_filters.append(f"pf.function like {text}")
-		or_filters.append(f"pi.industry like {text}")
+	if min(len(word) for word in words) < MIN_FULLTEXT_TOKEN_SIZE:
+		return "AND search_text LIKE %(text)s", {"text": f"%{escape_like(cstr(text).lower())}%"}, None
 
-	return "AND ({})".format(" OR ".join(or_filters)) if or_filters else ""
+	match = "MATCH(search_text) AGAINST (%(text)s IN BOOLEAN MODE)"
+	return f"AND {match}", {"text": " ".join(f"+{word}*" for word in words)}, match
 
 
 def get_user_details(users):
-	user_details = []
-	for user in users:
-		details = frappe.db.get_value(
-			"User",
-			user,
-			["name", "username", "full_name", "user_image", "headline", "looking_for_job"],
-			as_dict=True,
-		)
-		user_details.append(Widgets().MemberCard(member=details, avatar_class="avatar-large"))
+	"""Returns the rendered member cards of the users, in the order of `users`."""
+	names = [user.name for user in users]
+	if not names:
+		return []
+
+	details = frappe.get_all(
+		"User",
+		{"name": ["in", names]},
+		["name", "username", "full_name", "user_image", "headline", "looking_for_job"],
+	)
+	details = {user.name: user for user in details}
+
+	return Widgets().MemberCard.render_many(
+		[
+			{"member": details[name], "avatar_class": "avatar-large"}
+			for name in names
+			if name in details
+		]
+	)
 
-	return user_details
 
+def get_users(condition, values, rank, start, page_length):
+	order_by = "user_creation desc"
+	if rank:
+		order_by = f"{rank} desc, {order_by}"
 
-def get_users(or_filters, start, page_length):
 	users = frappe.db.sql(
-		"""
-        SELECT DISTINCT u.name
-        FROM `tabUser` u
-        LEFT JOIN `tabEducation Detail` ed
-        ON u.name = ed.parent
-        LEFT JOIN `tabWork Experience` we
-        ON u.name = we.parent
-        LEFT JOIN `tabCertification` c
-        ON u.name = c.parent
-        LEFT JOIN `tabSkills` s
-        ON u.name = s.parent
-        LEFT JOIN `tabPreferred Function` pf
-        ON u.name = pf.parent
-        LEFT JOIN `tabPreferred Industry` pi
-        ON u.name = pi.parent
-        WHERE u.enabled = True {or_filters}
-        ORDER BY u.creation desc
-        LIMIT {start}, {page_length}
-	""".format(
-			or_filters=or_filters, start=start, page_length=page_length
-		),
+		f"""
+		SELECT user as name
+		FROM `tabLMS Member Search Index`
+		WHERE enabled = 1 {condition}
+		ORDER BY {order_by}
+		LIMIT %(start)s, %(page_length)s
+	""",
+		{**values, "start": cint(start), "page_length": cint(page_length)},
 		as_dict=1,
 	)
 
@@ -360,4 +374,5 @@ def save_role(user, role, value):
 		doc.save(ignore_permissions=True)
 	else:
 		frappe.db.delete("Has Role", {"parent": user, "role": role})
+	clear_role_directory()
 	return True
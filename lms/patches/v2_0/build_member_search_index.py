@@ -0,0 +1,7 @@
+from lms.lms.doctype.lms_member_search_index.lms_member_search_index import (
+	rebuild_member_search_index,
+)
+
+
+def execute():
+	rebuild_member_search_index()
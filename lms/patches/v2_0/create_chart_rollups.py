@@ -0,0 +1,5 @@
+from lms.lms.doctype.lms_chart_rollup.lms_chart_rollup import update_chart_rollups
+
+
+def execute():
+	update_chart_rollups()
@@ -0,0 +1,19 @@
+import frappe
+
+
+def execute():
+	"""Keeps the first progress of a member for a lesson, so that the unique
+	(member, course, lesson) key can be added."""
+	frappe.db.sql(
+		"""
+		DELETE duplicate FROM `tabLMS Course Progress` duplicate
+		INNER JOIN `tabLMS Course Progress` progress
+			ON progress.member = duplicate.member
+			AND progress.course = duplicate.course
+			AND progress.lesson = duplicate.lesson
+			AND (
+				progress.creation < duplicate.creation
+				OR (progress.creation = duplicate.creation AND progress.name < duplicate.name)
+			)
+	"""
+	)
@@ -1,10 +1,5 @@
-import frappe
-from lms.lms.utils import get_course_progress
+from lms.lms.utils import recompute_progress
 
 
 def execute():
-	enrollments = frappe.get_all("LMS Enrollment", fields=["name", "course", "member"])
-
-	for enrollment in enrollments:
-		progress = get_course_progress(enrollment.course, enrollment.member)
-		frappe.db.set_value("LMS Enrollment", enrollment.name, "progress", progress)
+	recompute_progress()
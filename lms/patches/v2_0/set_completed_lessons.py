@@ -0,0 +1,5 @@
+from lms.lms.utils import recompute_progress
+
+
+def execute():
+	recompute_progress()
@@ -0,0 +1,7 @@
+import frappe
+from lms.lms.utils import update_course_rating
+
+
+def execute():
+	for course in frappe.get_all("LMS Course", pluck="name"):
+		update_course_rating(course)
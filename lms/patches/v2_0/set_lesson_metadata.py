@@ -0,0 +1,17 @@
+import json
+import frappe
+from lms.lms.utils import get_lesson_metadata
+
+
+def execute():
+	lessons = frappe.get_all("Course Lesson", fields=["name", "body", "content"])
+
+	for lesson in lessons:
+		metadata = get_lesson_metadata(lesson.body, lesson.content)
+		icon = metadata.pop("icon")
+		frappe.db.set_value(
+			"Course Lesson",
+			lesson.name,
+			{"icon": icon, "metadata": json.dumps(metadata)},
+			update_modified=False,
+		)
@@ -15,8 +15,10 @@ be loaded in a webpage.
 """
 
 import frappe
+from html import escape
 from urllib.parse import quote
 from frappe import _
+from lms.lms.md import trusted_renderer
 
 
 class PageExtension:
@@ -163,19 +165,21 @@ def exercise_renderer(argument):
 	return frappe.render_template("templates/exercise.html", context)
 
 
+@trusted_renderer
 def youtube_video_renderer(video_id):
 	return f"""
     <iframe width="100%" height="400"
-        src="https://www.youtube.com/embed/{video_id}"
+        src="https://www.youtube.com/embed/{escape(video_id)}"
         title="YouTube video player"
         frameborder="0"
-        class="youtube-video
+        class="youtube-video"
         allow="accelerometer; autoplay; clipboard-write; encrypted-media; gyroscope; picture-in-picture"
         allowfullscreen>
     </iframe>
     """
 
 
+@trusted_renderer
 def embed_renderer(details):
 	type = details.split("|||")[0]
 	src = details.split("|||")[1]
@@ -187,8 +191,8 @@ def embed_renderer(details):
 		height = "600"
 
 	return f"""
-	<iframe width={width} height={height}
-		src={src}
+	<iframe width="{width}" height="{height}"
+		src="{escape(src)}"
 		title="Embedded Content"
 		frameborder="0"
 		style="border-radius: var(--border-radius-lg)"
@@ -198,14 +202,17 @@ def embed_renderer(details):
 	"""
 
 
+@trusted_renderer
 def video_renderer(src):
 	return f"<video controls width='100%' controls controlsList='nodownload'><source src={quote(src)} type='video/mp4'></video>"
 
 
+@trusted_renderer
 def audio_renderer(src):
 	return f"<audio width='100%' controls controlsList='nodownload'><source src={quote(src)} type='audio/mp3'></audio>"
 
 
+@trusted_renderer
 def pdf_renderer(src):
 	return f"<iframe src='{quote(src)}#toolbar=0' width='100%' height='700px'></iframe>"
 
@@ -1,8 +1,10 @@
 # Copyright (c) 2021, FOSS United and Contributors
 # See license.txt
 import unittest
+from unittest.mock import patch
 
 import frappe
+from jinja2 import DictLoader, Environment
 
 from .widgets import Widget, Widgets
 
@@ -16,3 +18,13 @@ class TestWidgets(unittest.TestCase):
 	def _test_Widget(self):
 		hello = Widget("HelloWorld")
 		assert hello(name="Test") == "Hello, Test"
+
+	def test_render_many(self):
+		env = Environment(loader=DictLoader({"lms/widgets/Hello.html": "Hello, {{ name }}"}))
+		with patch("lms.widgets.get_jenv", return_value=env):
+			hello = Widget("Hello", {})
+			assert hello.render_many([{"name": "A"}, {"name": "B"}]) == [
+				"Hello, A",
+				"Hello, B",
+			]
+			assert hello.get_template() is Widget("Hello", {}).get_template()
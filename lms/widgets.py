@@ -64,8 +64,20 @@ class Widget:
 		self.name = name
 
 	def __call__(self, **kwargs):
-		# the widget could be in any of the modules
-		paths = [f"{module}/widgets/{self.name}.html" for module in MODULES]
-		env = get_jenv()
 		kwargs.update(self.widget_globals)
-		return env.get_or_select_template(paths).render(kwargs)
+		return self.get_template().render(kwargs)
+
+	def render_many(self, items):
+		"""Renders the widget once for each dict of arguments in `items`.
+
+		    >>> Widget("HelloWorld").render_many([{"name": "A"}, {"name": "B"}])
+		    ['<div>Hello, A</div>', '<div>Hello, B</div>']
+		"""
+		template = self.get_template()
+		return [template.render({**kwargs, **self.widget_globals}) for kwargs in items]
+
+	def get_template(self):
+		# the widget could be in any of the modules.
+		# Loaded templates are cached by the jinja environment itself.
+		paths = [f"{module}/widgets/{self.name}.html" for module in MODULES]
+		return get_jenv().get_or_select_template(paths)